@@ -1,27 +1,60 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.routers.attractions.attractions_router import router as attraction_router
+from app.routers.batch.batch_router import router as batch_router
 from app.routers.external_services.external_services_router import (
     router as external_services_router,
 )
+from app.routers.metrics.metrics_router import router as metrics_router
 from app.routers.notifications.notifications_router import (
     router as notifications_router,
 )
+from app.routers.planner.planner_router import PLAN_REQUEST_ID_HEADER
 from app.routers.planner.planner_router import router as planner_router
 from app.routers.users.authentication_router import router as authentication_router
 from app.routers.users.password_router import router as password_router
 from app.routers.users.users_router import router as users_router
+from app.services.avatar_service import shutdown_avatar_pool
+from app.services.deadline import DeadlineMiddleware
+from app.services.external_services.cities_services import load_city_index
+from app.services.metadata_cache import metadata_cache
+from app.services.plan_outbox import plan_outbox
+from app.services.plan_publisher import plan_publisher
+from app.services.plan_watcher import plan_watcher
+from app.services.upstream_client import upstream_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream_client.start()
+    await run_in_threadpool(load_city_index)
+    metadata_cache.start()
+    plan_publisher.start()
+    await plan_outbox.start()
+    yield
+    await plan_watcher.stop()
+    await plan_outbox.stop()
+    await plan_publisher.stop()
+    await metadata_cache.stop()
+    shutdown_avatar_pool()
+    await upstream_client.close()
+
 
-app = FastAPI(title="API Gateway")
+app = FastAPI(title="API Gateway", lifespan=lifespan)
 
+app.add_middleware(DeadlineMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PLAN_REQUEST_ID_HEADER],
     max_age=3600,
 )
 
@@ -32,6 +65,8 @@ app.include_router(attraction_router)
 app.include_router(external_services_router)
 app.include_router(notifications_router)
 app.include_router(planner_router)
+app.include_router(batch_router)
+app.include_router(metrics_router)
 
 
 @app.get("/", include_in_schema=False)
@@ -1,31 +1,36 @@
-import os
 import urllib.parse
 from typing import List, Optional
 
-import requests
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query
 from fastapi.responses import Response
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from app.schemas.attractions_schemas.attractions import (
     AttractionByID,
     AttractionByText,
+    AttractionsBatch,
     AttractionsFilter,
     AutocompleteAttractions,
     InteractiveAttraction,
     ScheduleAttraction,
     SearchAttractionByText,
 )
-from app.services.attractions import parse_attraction_by_id, parse_attraction_list_info
-from app.services.authentication_service import check_authentication, get_user_id
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.attractions import (
+    fetch_attraction_by_id,
+    fetch_attractions_batch,
+    invalidate_attraction,
+    invalidate_comment,
+    invalidate_user_attraction,
+    parse_attraction_list_info,
+)
+from app.services.authentication_service import get_authenticated_user
 from app.services.handle_error_service import handle_response_error
+from app.services.metadata_cache import etag_matches, metadata_cache
+from app.services.upstream_client import ATTRACTIONS, upstream_client
 from app.utils.api_exception import APIException, APIExceptionToHTTP, HTTPException
 from app.utils.constants import *
 
-ATTRACTIONS_URL = os.getenv("ATTRACTIONS_URL")
-
 router = APIRouter()
-security = HTTPBearer()
 
 ###################
 #    METADATA     #
@@ -38,13 +43,15 @@ security = HTTPBearer()
     tags=["Metadata"],
     description="Gets tha application metadata",
 )
-def get_metadata():
+async def get_metadata(if_none_match: Optional[str] = Header(None)):
     try:
-        response = requests.get(f"{ATTRACTIONS_URL}/metadata")
+        payload, etag = await metadata_cache.get()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-        handle_response_error(200, response)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
 
-        return response.json()
+        return Response(content=payload, media_type="application/json", headers=headers)
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -64,29 +71,34 @@ def get_metadata():
     tags=["Search Attractions"],
     description="Gets an attraction given its ID",
 )
-def get_attraction(
+async def get_attraction(
     attraction_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            params = {}
-
-            params["user_id"] = get_user_id(credentials)
-
-            response = requests.get(
-                f"{ATTRACTIONS_URL}/attractions/byid/{attraction_id}", params=params
-            )
-
-            handle_response_error(200, response)
-
-            return parse_attraction_by_id(response.json())
+        return await fetch_attraction_by_id(attraction_id, user.user_id)
     except HTTPException as e:
         raise e
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
 
 
+# Get many attractions by id
+
+
+@router.post(
+    "/attractions/byid/batch",
+    status_code=200,
+    tags=["Search Attractions"],
+    description="Gets many attractions given their IDs, in the same order",
+)
+async def get_attractions_batch(
+    batch: AttractionsBatch,
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
+    return await fetch_attractions_batch(batch.attraction_ids, user.user_id)
+
+
 # Get attraction by text
 
 
@@ -96,34 +108,36 @@ def get_attraction(
     tags=["Search Attractions"],
     description="Searches attractions given a text query",
 )
-def search_attraction_by_text(
+async def search_attraction_by_text(
     attraction: SearchAttractionByText,
     type: Optional[str] = None,
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-
-            params = {}
-            if type:
-                params["type"] = type
+        params = {}
+        if type:
+            params["type"] = type
 
-            if longitude and latitude:
-                params["longitude"] = longitude
-                params["latitude"] = latitude
+        if longitude and latitude:
+            params["longitude"] = longitude
+            params["latitude"] = latitude
 
-            data = {"query": attraction.attraction_name}
-            response: Response = requests.post(
-                f"{ATTRACTIONS_URL}/attractions/search",
-                json=data,
-                params=params,
-            )
+        data = {"query": attraction.attraction_name}
+        # Read-only despite being a POST, safe to retry and hedge
+        response: Response = await upstream_client.post(
+            ATTRACTIONS,
+            "/attractions/search",
+            json=data,
+            params=params,
+            idempotent=True,
+            hedge=True,
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
 
-            return parse_attraction_list_info(response.json())
+        return parse_attraction_list_info(response.json())
 
     except HTTPException as e:
         raise e
@@ -140,28 +154,28 @@ def search_attraction_by_text(
     tags=["Search Attractions"],
     description="Gets nearby attractions given a latitude and longitude",
 )
-def get_nearby_attractions(
+async def get_nearby_attractions(
     latitude: float,
     longitude: float,
     radius: float,
     attraction_types: Optional[AttractionsFilter] = None,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            url = (
-                f"{ATTRACTIONS_URL}/attractions/nearby/{latitude}/{longitude}/{radius}"
-            )
-            params = {}
+        url = f"/attractions/nearby/{latitude}/{longitude}/{radius}"
+        params = {}
 
-            if attraction_types and attraction_types.attraction_types:
-                params["attraction_types"] = attraction_types.attraction_types
+        if attraction_types and attraction_types.attraction_types:
+            params["attraction_types"] = attraction_types.attraction_types
 
-            response = requests.post(url, json=params)
+        # Read-only despite being a POST, safe to retry and hedge
+        response = await upstream_client.post(
+            ATTRACTIONS, url, json=params, idempotent=True, hedge=True
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
 
-            return parse_attraction_list_info(response.json())
+        return parse_attraction_list_info(response.json())
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -177,20 +191,20 @@ def get_nearby_attractions(
     tags=["Search Attractions"],
     description="Gets similar attractions given an attraction ID",
 )
-def get_attraction_recommendations(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+async def get_attraction_recommendations(
+    user: AuthenticatedUser = Depends(get_authenticated_user),
     page: int = Query(0, description="Page number", ge=0),
     size: int = Query(10, description="Number of items per page", ge=1, le=100),
 ):
     try:
-        if check_authentication(credentials):
-            user_id = get_user_id(credentials)
-            response: Response = requests.get(
-                f"{ATTRACTIONS_URL}/attractions/recommendations/{user_id}?page={page}&size={size}",
-            )
-
-            handle_response_error(200, response)
-            return parse_attraction_list_info(response.json())
+        user_id = user.user_id
+        response: Response = await upstream_client.get(
+            ATTRACTIONS,
+            f"/attractions/recommendations/{user_id}?page={page}&size={size}",
+        )
+
+        handle_response_error(200, response)
+        return parse_attraction_list_info(response.json())
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -208,31 +222,30 @@ def get_attraction_recommendations(
     tags=["Search Attractions"],
     description="Returns attractions predictions given a substring. Can filter by a list of attraction types.",
 )
-def autocomplete_attractions(
+async def autocomplete_attractions(
     data: AutocompleteAttractions,
     attraction_types: List[str] = Query(
         None,
         title="Attraction Types",
         description="Filter by attraction types",
     ),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        params = {"query": data.attraction_name}
 
-            params = {"query": data.attraction_name}
+        if attraction_types:
+            params["attraction_types"] = ",".join(attraction_types)
 
-            if attraction_types:
-                params["attraction_types"] = ",".join(attraction_types)
+        response: Response = await upstream_client.post(
+            ATTRACTIONS,
+            "/attractions/autocomplete",
+            json=params,
+        )
 
-            response: Response = requests.post(
-                f"{ATTRACTIONS_URL}/attractions/autocomplete",
-                json=params,
-            )
+        handle_response_error(201, response)
 
-            handle_response_error(201, response)
-
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -250,15 +263,14 @@ def autocomplete_attractions(
     tags=["Search Attractions"],
     description="Runs the recommendation system",
 )
-def run_recommendation_system(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+async def run_recommendation_system(
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-
-            response: Response = requests.post(
-                f"{ATTRACTIONS_URL}/attractions/run-recommendation-system",
-            )
+        response: Response = await upstream_client.post(
+            ATTRACTIONS,
+            "/attractions/run-recommendation-system",
+        )
 
     except HTTPException as e:
         raise e
@@ -278,24 +290,25 @@ def run_recommendation_system(
     tags=["Save Attraction"],
     description="Saves an attraction for a user",
 )
-def save_attraction(
-    attraction_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def save_attraction(
+    attraction_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-
-            current_user_id = get_user_id(credentials)
+        current_user_id = user.user_id
 
-            data = {
-                "user_id": current_user_id,
-                "attraction_id": attraction_id,
-            }
+        data = {
+            "user_id": current_user_id,
+            "attraction_id": attraction_id,
+        }
 
-            response = requests.post(f"{ATTRACTIONS_URL}/attractions/save", json=data)
+        response = await upstream_client.post(
+            ATTRACTIONS, "/attractions/save", json=data
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
+        invalidate_user_attraction(attraction_id, current_user_id)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -311,24 +324,23 @@ def save_attraction(
     tags=["Save Attraction"],
     description="Unsaves an attraction for a user",
 )
-def unsave_attraction(
-    attraction_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def unsave_attraction(
+    attraction_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
+        current_user_id = user.user_id
 
-            current_user_id = get_user_id(credentials)
-
-            data = {
-                "user_id": current_user_id,
-                "attraction_id": attraction_id,
-            }
+        data = {
+            "user_id": current_user_id,
+            "attraction_id": attraction_id,
+        }
 
-            response = requests.delete(
-                f"{ATTRACTIONS_URL}/attractions/unsave", json=data
-            )
+        response = await upstream_client.delete(
+            ATTRACTIONS, "/attractions/unsave", json=data, idempotent=True
+        )
 
-            handle_response_error(204, response)
+        handle_response_error(204, response)
+        invalidate_user_attraction(attraction_id, current_user_id)
 
     except HTTPException as e:
         raise e
@@ -345,23 +357,22 @@ def unsave_attraction(
     tags=["Save Attraction"],
     description="Returns a list of the attractions saved by an user",
 )
-def get_saved_attractions_list(
+async def get_saved_attractions_list(
     page: int = Query(0, description="Page number", ge=0),
     size: int = Query(10, description="Number of items per page", ge=1, le=100),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        current_user_id = user.user_id
 
-            current_user_id = get_user_id(credentials)
+        response = await upstream_client.get(
+            ATTRACTIONS,
+            f"/attractions/save-list?user_id={current_user_id}&page={page}&size={size}",
+        )
 
-            response = requests.get(
-                f"{ATTRACTIONS_URL}/attractions/save-list?user_id={current_user_id}&page={page}&size={size}",
-            )
-
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -381,21 +392,22 @@ def get_saved_attractions_list(
     tags=["Like Attraction"],
     description="Likes an attraction for a user",
 )
-def like_attraction(
-    attraction_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def like_attraction(
+    attraction_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-
-            current_user_id = get_user_id(credentials)
+        current_user_id = user.user_id
 
-            data = {"user_id": current_user_id, "attraction_id": attraction_id}
+        data = {"user_id": current_user_id, "attraction_id": attraction_id}
 
-            response = requests.post(f"{ATTRACTIONS_URL}/attractions/like", json=data)
+        response = await upstream_client.post(
+            ATTRACTIONS, "/attractions/like", json=data
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
+        invalidate_attraction(attraction_id, current_user_id)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -411,21 +423,20 @@ def like_attraction(
     tags=["Like Attraction"],
     description="Unlikes an attraction for a user",
 )
-def unlike_attraction(
-    attraction_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def unlike_attraction(
+    attraction_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-
-            current_user_id = get_user_id(credentials)
+        current_user_id = user.user_id
 
-            data = {"user_id": current_user_id, "attraction_id": attraction_id}
+        data = {"user_id": current_user_id, "attraction_id": attraction_id}
 
-            response = requests.delete(
-                f"{ATTRACTIONS_URL}/attractions/unlike", json=data
-            )
+        response = await upstream_client.delete(
+            ATTRACTIONS, "/attractions/unlike", json=data, idempotent=True
+        )
 
-            handle_response_error(204, response)
+        handle_response_error(204, response)
+        invalidate_attraction(attraction_id, current_user_id)
 
     except HTTPException as e:
         raise e
@@ -442,23 +453,22 @@ def unlike_attraction(
     tags=["Like Attraction"],
     description="Returns a list of the attractions liked by an user",
 )
-def get_liked_attractions_list(
+async def get_liked_attractions_list(
     page: int = Query(0, description="Page number", ge=0),
     size: int = Query(10, description="Number of items per page", ge=1, le=100),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        current_user_id = user.user_id
 
-            current_user_id = get_user_id(credentials)
+        response = await upstream_client.get(
+            ATTRACTIONS,
+            f"/attractions/like-list?user_id={current_user_id}&page={page}&size={size}",
+        )
 
-            response = requests.get(
-                f"{ATTRACTIONS_URL}/attractions/like-list?user_id={current_user_id}&page={page}&size={size}",
-            )
-
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -478,21 +488,22 @@ def get_liked_attractions_list(
     tags=["Done Attraction"],
     description="Marks as done a attraction for a user",
 )
-def mark_as_done_attraction(
-    attraction_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def mark_as_done_attraction(
+    attraction_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-
-            current_user_id = get_user_id(credentials)
+        current_user_id = user.user_id
 
-            data = {"user_id": current_user_id, "attraction_id": attraction_id}
+        data = {"user_id": current_user_id, "attraction_id": attraction_id}
 
-            response = requests.post(f"{ATTRACTIONS_URL}/attractions/done", json=data)
+        response = await upstream_client.post(
+            ATTRACTIONS, "/attractions/done", json=data
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
+        invalidate_user_attraction(attraction_id, current_user_id)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -508,21 +519,20 @@ def mark_as_done_attraction(
     tags=["Done Attraction"],
     description="Marks as undone an attraction for a user",
 )
-def mark_as_undone_attraction(
-    attraction_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def mark_as_undone_attraction(
+    attraction_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-
-            current_user_id = get_user_id(credentials)
+        current_user_id = user.user_id
 
-            data = {"user_id": current_user_id, "attraction_id": attraction_id}
+        data = {"user_id": current_user_id, "attraction_id": attraction_id}
 
-            response = requests.delete(
-                f"{ATTRACTIONS_URL}/attractions/undone", json=data
-            )
+        response = await upstream_client.delete(
+            ATTRACTIONS, "/attractions/undone", json=data, idempotent=True
+        )
 
-            handle_response_error(204, response)
+        handle_response_error(204, response)
+        invalidate_user_attraction(attraction_id, current_user_id)
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -538,23 +548,22 @@ def mark_as_undone_attraction(
     tags=["Done Attraction"],
     description="Returns a list of the attractions done by an user",
 )
-def get_done_attractions_list(
+async def get_done_attractions_list(
     page: int = Query(0, description="Page number", ge=0),
     size: int = Query(10, description="Number of items per page", ge=1, le=100),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        current_user_id = user.user_id
 
-            current_user_id = get_user_id(credentials)
+        response = await upstream_client.get(
+            ATTRACTIONS,
+            f"/attractions/done-list?user_id={current_user_id}&page={page}&size={size}",
+        )
 
-            response = requests.get(
-                f"{ATTRACTIONS_URL}/attractions/done-list?user_id={current_user_id}&page={page}&size={size}",
-            )
-
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -572,27 +581,28 @@ def get_done_attractions_list(
     tags=["Rate Attraction"],
     description="Rates an attraction by an user",
 )
-def rate_attraction(
+async def rate_attraction(
     attraction_id: str,
     rating: int = Query(5, description="Rating must be between 1 and 5"),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-
-            current_user_id = get_user_id(credentials)
+        current_user_id = user.user_id
 
-            data = {
-                "user_id": current_user_id,
-                "attraction_id": attraction_id,
-                "rating": rating,
-            }
+        data = {
+            "user_id": current_user_id,
+            "attraction_id": attraction_id,
+            "rating": rating,
+        }
 
-            response = requests.post(f"{ATTRACTIONS_URL}/attractions/rate", json=data)
+        response = await upstream_client.post(
+            ATTRACTIONS, "/attractions/rate", json=data
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
+        invalidate_attraction(attraction_id, current_user_id)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -612,29 +622,28 @@ def rate_attraction(
     tags=["Comment Attraction"],
     description="Comments an attraction for an user",
 )
-def comment_attraction(
+async def comment_attraction(
     attraction_id: str,
     comment: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        current_user_id = user.user_id
 
-            current_user_id = get_user_id(credentials)
-
-            data = {
-                "user_id": current_user_id,
-                "attraction_id": attraction_id,
-                "comment": comment,
-            }
+        data = {
+            "user_id": current_user_id,
+            "attraction_id": attraction_id,
+            "comment": comment,
+        }
 
-            response = requests.post(
-                f"{ATTRACTIONS_URL}/attractions/comment", json=data
-            )
+        response = await upstream_client.post(
+            ATTRACTIONS, "/attractions/comment", json=data
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
+        invalidate_attraction(attraction_id)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -650,19 +659,18 @@ def comment_attraction(
     tags=["Comment Attraction"],
     description="Deletes a comment by comment_id",
 )
-def delete_comment(
-    comment_id: int, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def delete_comment(
+    comment_id: int, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-
-            data = {"comment_id": comment_id}
+        data = {"comment_id": comment_id}
 
-            response = requests.delete(
-                f"{ATTRACTIONS_URL}/attractions/comment", json=data
-            )
+        response = await upstream_client.delete(
+            ATTRACTIONS, "/attractions/comment", json=data
+        )
 
-            handle_response_error(204, response)
+        handle_response_error(204, response)
+        invalidate_comment(comment_id)
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -678,21 +686,22 @@ def delete_comment(
     tags=["Comment Attraction"],
     description="Edits a comment by comment_id",
 )
-def update_comment(
+async def update_comment(
     comment_id: int,
     new_comment: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        data = {"comment_id": comment_id, "new_comment": new_comment}
 
-            data = {"comment_id": comment_id, "new_comment": new_comment}
+        response = await upstream_client.put(
+            ATTRACTIONS, "/attractions/comment", json=data, idempotent=True
+        )
 
-            response = requests.put(f"{ATTRACTIONS_URL}/attractions/comment", json=data)
+        handle_response_error(201, response)
+        invalidate_comment(comment_id)
 
-            handle_response_error(201, response)
-
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -712,36 +721,36 @@ def update_comment(
     tags=["Schedule Attraction"],
     description="Schedules an attraction for a user at a certain timestamp",
 )
-def schedule_attraction(
+async def schedule_attraction(
     data: ScheduleAttraction,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            attraction_id = data.attraction_id
-            user_id = get_user_id(credentials)
-            datetime = data.scheduled_time.isoformat()
-
-            response = requests.post(
-                f"{ATTRACTIONS_URL}/attractions/schedule",
-                json={
-                    "user_id": user_id,
-                    "attraction_id": attraction_id,
-                    "datetime": datetime,
-                },
-            )
-
-            handle_response_error(201, response)
-
-            attraction_info = response.json()
-
-            return InteractiveAttraction.model_construct(
-                user_id=user_id,
-                attraction_id=attraction_id,
-                attraction_name="",
-                attraction_country="",
-                attraction_city="",
-            )
+        attraction_id = data.attraction_id
+        user_id = user.user_id
+        datetime = data.scheduled_time.isoformat()
+
+        response = await upstream_client.post(
+            ATTRACTIONS,
+            "/attractions/schedule",
+            json={
+                "user_id": user_id,
+                "attraction_id": attraction_id,
+                "datetime": datetime,
+            },
+        )
+
+        handle_response_error(201, response)
+
+        attraction_info = response.json()
+
+        return InteractiveAttraction.model_construct(
+            user_id=user_id,
+            attraction_id=attraction_id,
+            attraction_name="",
+            attraction_country="",
+            attraction_city="",
+        )
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -757,25 +766,25 @@ def schedule_attraction(
     tags=["Schedule Attraction"],
     description="Unschedules an attraction for a user",
 )
-def unschedule_attraction(
+async def unschedule_attraction(
     attraction_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-
-            user_id = get_user_id(credentials)
-            unscheduled_attraction = {
-                "user_id": user_id,
-                "attraction_id": attraction_id,
-            }
+        user_id = user.user_id
+        unscheduled_attraction = {
+            "user_id": user_id,
+            "attraction_id": attraction_id,
+        }
 
-            response = requests.delete(
-                f"{ATTRACTIONS_URL}/attractions/unschedule",
-                json=unscheduled_attraction,
-            )
+        response = await upstream_client.delete(
+            ATTRACTIONS,
+            "/attractions/unschedule",
+            json=unscheduled_attraction,
+            idempotent=True,
+        )
 
-            handle_response_error(204, response)
+        handle_response_error(204, response)
 
     except HTTPException as e:
         raise e
@@ -790,24 +799,23 @@ def unschedule_attraction(
     tags=["Schedule Attraction"],
     description="Returns a list of the attractions scheduled by an user",
 )
-def get_scheduled_attractions_list(
+async def get_scheduled_attractions_list(
     page: int = Query(0, description="Page number", ge=0),
     size: int = Query(10, description="Number of items per page", ge=1, le=100),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
+        user_id = user.user_id
 
-            user_id = get_user_id(credentials)
+        response = await upstream_client.get(
+            ATTRACTIONS,
+            "/attractions/scheduled-list",
+            params={"user_id": user_id, "page": page, "size": size},
+        )
 
-            response = requests.get(
-                f"{ATTRACTIONS_URL}/attractions/scheduled-list",
-                params={"user_id": user_id, "page": page, "size": size},
-            )
-
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            return response.json()
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -0,0 +1,27 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Request
+
+from app.schemas.batch_schemas.batch import BatchRequest, SubResponse
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.authentication_service import get_authenticated_user
+from app.services.batch_service import dispatch_batch
+
+router = APIRouter()
+
+
+@router.post(
+    "/batch",
+    tags=["Batch"],
+    status_code=200,
+    response_model=List[SubResponse],
+    description="Runs many gateway calls concurrently under one authentication",
+)
+async def batch(
+    batch_request: BatchRequest,
+    request: Request,
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
+    return await dispatch_batch(
+        request.app, batch_request.requests, user, request.scope
+    )
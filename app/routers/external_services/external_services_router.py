@@ -1,27 +1,38 @@
-import os
 from datetime import date
 from typing import Optional
 
-import requests
 from fastapi import APIRouter, Depends
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.responses import StreamingResponse
 
 from app.schemas.external_services_schemas.chatbot import AssistantResponse, ChatMessage
 from app.schemas.external_services_schemas.cities import Cities
 from app.schemas.external_services_schemas.currency import Currency
 from app.schemas.external_services_schemas.flights import FlightInfo
 from app.schemas.external_services_schemas.weather import FiveDayWeather
-from app.services.authentication_service import check_authentication, get_user_id
-from app.services.external_services.cities_services import parse_cities
-from app.services.external_services.weather_services import parse_weather_days
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.authentication_service import get_authenticated_user
+from app.services.external_services.chatbot_services import open_assistant_stream
+from app.services.external_services.cities_services import city_index, parse_cities
+from app.services.external_services.currency_services import (
+    CURRENCY_RATE_TTL,
+    convert_currency,
+    currency_pair_key,
+    currency_rate_cache,
+    parse_currency_rate,
+)
+from app.services.external_services.weather_services import (
+    parse_weather_days,
+    seconds_until_next_forecast,
+    weather_cache,
+    weather_cache_key,
+)
 from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import EXTERNAL_SERVICES, upstream_client
 from app.utils.api_exception import *
 from app.utils.constants import *
-
-EXTERNAL_SERVICES_URL = os.getenv("EXTERNAL_SERVICES_URL")
+from app.utils.sse import SSE_HEADERS, SSE_MEDIA_TYPE
 
 router = APIRouter()
-security = HTTPBearer()
 
 # Flight
 
@@ -31,31 +42,31 @@ async def flight_information(
     carrier_code: str,
     flight_number: str,
     departure_date: date,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.get(
-                f"{EXTERNAL_SERVICES_URL}/flights/status",
-                params={
-                    "carrier_code": carrier_code,
-                    "flight_number": flight_number,
-                    "departure_date": departure_date,
-                },
-            )
+        response = await upstream_client.get(
+            EXTERNAL_SERVICES,
+            "/flights/status",
+            params={
+                "carrier_code": carrier_code,
+                "flight_number": flight_number,
+                "departure_date": departure_date,
+            },
+        )
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            response_data = response.json()
+        response_data = response.json()
 
-            return FlightInfo.model_construct(
-                flight_departure_date=response_data["flight_departure_date"],
-                flight_departure_time=response_data["flight_departure_time"],
-                flight_arrival_date=response_data["flight_arrival_date"],
-                flight_arrival_time=response_data["flight_arrival_time"],
-                departure_airport=response_data["departure_airport"],
-                arrival_airport=response_data["arrival_airport"],
-            )
+        return FlightInfo.model_construct(
+            flight_departure_date=response_data["flight_departure_date"],
+            flight_departure_time=response_data["flight_departure_time"],
+            flight_arrival_date=response_data["flight_arrival_date"],
+            flight_arrival_time=response_data["flight_arrival_time"],
+            departure_airport=response_data["departure_airport"],
+            arrival_airport=response_data["arrival_airport"],
+        )
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -72,16 +83,20 @@ async def flight_information(
     description="Location weather",
     response_model=FiveDayWeather,
 )
-def location_weather(
+async def location_weather(
     city: str,
     province: Optional[str] = None,
     country: Optional[str] = None,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.get(
-                f"{EXTERNAL_SERVICES_URL}/weather",
+        key = weather_cache_key(city, province, country)
+        weather = weather_cache.get(key)
+
+        if weather is None:
+            response = await upstream_client.get(
+                EXTERNAL_SERVICES,
+                "/weather",
                 params={"city": city, "province": province, "country": country},
             )
 
@@ -89,7 +104,10 @@ def location_weather(
 
             weather_data = response.json()
 
-            return parse_weather_days(weather_data)
+            weather = parse_weather_days(weather_data)
+            weather_cache.set(key, weather, seconds_until_next_forecast())
+
+        return weather
 
     except HTTPException as e:
         raise e
@@ -107,32 +125,33 @@ def location_weather(
     description="Currency conversion",
     response_model=Currency,
 )
-def currency_conversor(
+async def currency_conversor(
     currency: str,
     interest_currency: str,
     amount: float,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.get(
-                f"{EXTERNAL_SERVICES_URL}/currency",
+        key = currency_pair_key(currency, interest_currency)
+        currency_rate = currency_rate_cache.get(key)
+
+        if currency_rate is None:
+            response = await upstream_client.get(
+                EXTERNAL_SERVICES,
+                "/currency",
                 params={
                     "currency": currency,
                     "interest_currency": interest_currency,
-                    "amount": amount,
+                    "amount": 1,
                 },
             )
 
             handle_response_error(200, response)
 
-            currency_data = response.json()
+            currency_rate = parse_currency_rate(response.json())
+            currency_rate_cache.set(key, currency_rate, CURRENCY_RATE_TTL)
 
-            return Currency.model_construct(
-                base_code=currency_data["base_code"],
-                target_code=currency_data["target_code"],
-                conversion=currency_data["conversion"],
-            )
+        return convert_currency(currency_rate, amount)
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -151,21 +170,21 @@ def currency_conversor(
 async def init_conversation(
     latitude: float,
     longitude: float,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            user_id = get_user_id(credentials)
-            response = requests.post(
-                f"{EXTERNAL_SERVICES_URL}/chatbot/init",
-                params={
-                    "user_id": user_id,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                },
-            )
+        user_id = user.user_id
+        response = await upstream_client.post(
+            EXTERNAL_SERVICES,
+            "/chatbot/init",
+            params={
+                "user_id": user_id,
+                "latitude": latitude,
+                "longitude": longitude,
+            },
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
 
     except HTTPException as e:
         raise e
@@ -182,25 +201,47 @@ async def init_conversation(
 )
 async def send_message(
     message: ChatMessage,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            user_id = get_user_id(credentials)
+        user_id = user.user_id
 
-            response = requests.post(
-                f"{EXTERNAL_SERVICES_URL}/chatbot/send_message/{user_id}",
-                json={"message": message.text},
-            )
+        response = await upstream_client.post(
+            EXTERNAL_SERVICES,
+            f"/chatbot/send_message/{user_id}",
+            json={"message": message.text},
+        )
 
-            handle_response_error(201, response)
+        handle_response_error(201, response)
 
-            assistant_response = dict(response.json())
+        assistant_response = dict(response.json())
 
-            return AssistantResponse.model_construct(
-                role=assistant_response["role"],
-                message=assistant_response["message"],
-            )
+        return AssistantResponse.model_construct(
+            role=assistant_response["role"],
+            message=assistant_response["message"],
+        )
+
+    except HTTPException as e:
+        raise e
+    except APIException as e:
+        raise APIExceptionToHTTP().convert(e)
+
+
+@router.post(
+    "/chatbot/send_message/stream",
+    tags=["Chatbot"],
+    status_code=200,
+    description="Send message to the assistant and stream its reply as Server-Sent Events",
+    response_class=StreamingResponse,
+)
+async def send_message_stream(
+    message: ChatMessage,
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
+    try:
+        stream = await open_assistant_stream(user.user_id, message.text)
+
+        return StreamingResponse(stream, media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
 
     except HTTPException as e:
         raise e
@@ -220,8 +261,12 @@ async def send_message(
 )
 async def get_cities_name(keyword: str):
     try:
-        response = requests.get(
-            f"{EXTERNAL_SERVICES_URL}/cities", params={"keyword": keyword}
+        indexed_cities = city_index.search(keyword)
+        if indexed_cities:
+            return Cities.model_construct(cities=indexed_cities)
+
+        response = await upstream_client.get(
+            EXTERNAL_SERVICES, "/cities", params={"keyword": keyword}
         )
 
         handle_response_error(200, response)
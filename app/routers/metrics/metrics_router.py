@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+
+from app.utils.metrics import collect_metrics
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    tags=["Metrics"],
+    status_code=200,
+    description="Gateway internal counters (caches, upstreams)",
+)
+async def get_metrics():
+    return collect_metrics()
@@ -1,20 +1,16 @@
-import os
 from datetime import datetime
 from typing import Annotated
 
-import requests
 from fastapi import APIRouter, Body, Depends
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from app.schemas.notifications.token import FcmToken
-from app.services.authentication_service import check_authentication, get_user_id
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.authentication_service import get_authenticated_user
 from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import NOTIFICATIONS, upstream_client
 from app.utils.api_exception import APIException, APIExceptionToHTTP, HTTPException
 
-NOTIFICATIONS_URL = os.getenv("NOTIFICATIONS_URL")
-
 router = APIRouter()
-security = HTTPBearer()
 
 
 @router.post(
@@ -23,18 +19,18 @@ security = HTTPBearer()
     status_code=201,
     description="Update user fcm token",
 )
-def update_user_avatar(
+async def update_user_avatar(
     token: FcmToken,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            user_id = get_user_id(credentials)
-            response = requests.post(
-                f"{NOTIFICATIONS_URL}/notifications/update_fcm_token",
-                json={"user_id": user_id, "fcm_token": token.fcm_token},
-            )
-            return response.json()
+        user_id = user.user_id
+        response = await upstream_client.post(
+            NOTIFICATIONS,
+            "/notifications/update_fcm_token",
+            json={"user_id": user_id, "fcm_token": token.fcm_token},
+        )
+        return response.json()
     except HTTPException as e:
         raise e
     except APIException as e:
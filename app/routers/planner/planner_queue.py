@@ -1,27 +1,26 @@
-import json
 import os
-import urllib.parse
-
-import boto3
 
 from app.schemas.planner_schemas.planner import PlanMetaData
+from app.services.plan_outbox import plan_outbox
+from app.services.plan_publisher import plan_deduplication_id
+from app.services.plan_watcher import encode_plan_request_id, plan_watcher
+from app.services.singleflight import SingleFlight
+from app.utils.metrics import register_metrics
+from app.utils.ttl_cache import TTLCache
+
+# Matches the 5 minute deduplication interval of SQS FIFO queues
+PLAN_DEDUPLICATION_WINDOW = float(os.getenv("PLAN_DEDUPLICATION_WINDOW", "300"))
+PLAN_DEDUPLICATION_MAX_SIZE = int(os.getenv("PLAN_DEDUPLICATION_MAX_SIZE", "10000"))
 
-aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_access_key = urllib.parse.quote_plus(
-    os.getenv("AWS_SECRET_ACCESS_KEY"), safe="/"
-)
-queue_url = os.getenv("QUEUE_URL")
+recent_plans = TTLCache(max_size=PLAN_DEDUPLICATION_MAX_SIZE)
+register_metrics("plan_deduplication", recent_plans.stats)
 
-sqs = boto3.client(
-    "sqs",
-    region_name="us-east-2",
-    aws_access_key_id=aws_access_key_id,
-    aws_secret_access_key=aws_secret_access_key,
-)
+plan_singleflight = SingleFlight()
+register_metrics("plan_singleflight", plan_singleflight.stats)
 
 
-def queue_plan(user_id: int, plan_metadata: PlanMetaData):
-    message = {
+def build_plan_message(user_id: int, plan_metadata: PlanMetaData) -> dict:
+    return {
         "user_id": user_id,
         "plan_name": plan_metadata.plan_name,
         "destination": plan_metadata.destination,
@@ -29,10 +28,21 @@ def queue_plan(user_id: int, plan_metadata: PlanMetaData):
         "end_date": str(plan_metadata.end_date),
     }
 
-    response = sqs.send_message(
-        QueueUrl=queue_url,
-        MessageBody=json.dumps(message),
-        MessageGroupId="planner",
-    )
 
-    print(f'Message sent: {response["MessageId"]}')
+async def queue_plan(user_id: int, plan_metadata: PlanMetaData) -> str:
+    message = build_plan_message(user_id, plan_metadata)
+    deduplication_id = plan_deduplication_id(message)
+
+    # Repeated taps within the window are answered without a new job
+    if recent_plans.get(deduplication_id) is None:
+        # Concurrent identical submissions share a single outbox write
+        await plan_singleflight.do(deduplication_id, lambda: enqueue(message))
+
+    # Same plan, same id, so repeated taps watch the same plan request
+    return encode_plan_request_id(message)
+
+
+async def enqueue(message: dict):
+    await plan_outbox.add(message)
+    recent_plans.set(plan_deduplication_id(message), True, PLAN_DEDUPLICATION_WINDOW)
+    plan_watcher.watch(encode_plan_request_id(message), message)
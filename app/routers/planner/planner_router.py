@@ -1,46 +1,67 @@
-import os
-
-import requests
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 
 from app.routers.planner.planner_queue import queue_plan
 from app.schemas.planner_schemas.planner import AttractionPlan, PlanMetaData
-from app.services.authentication_service import check_authentication, get_user_id
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.authentication_service import get_authenticated_user
 from app.services.handle_error_service import handle_response_error
+from app.services.plan_watcher import plan_watcher
+from app.services.upstream_client import PLANNER, upstream_client
 from app.utils.api_exception import APIException, APIExceptionToHTTP
+from app.utils.sse import SSE_HEADERS, SSE_MEDIA_TYPE
 
-PLANNER_URL = os.getenv("PLANNER_URL")
+PLAN_REQUEST_ID_HEADER = "X-Plan-Request-Id"
 
 router = APIRouter()
-security = HTTPBearer()
 
 
 @router.post("/plan", tags=["Planner"])
-def create_plan(
+async def create_plan(
     plan_metadata: PlanMetaData,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    response: Response,
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
+    try:
+        user_id = user.user_id
+        plan_request_id = await queue_plan(user_id, plan_metadata)
+
+        # Clients subscribe to /plan/events/{id} instead of polling /plan/user
+        response.headers[PLAN_REQUEST_ID_HEADER] = plan_request_id
+        return "Plan queued"
+    except APIException as e:
+        raise APIExceptionToHTTP().convert(e)
+
+
+@router.get(
+    "/plan/events/{plan_request_id}",
+    tags=["Planner"],
+    description="Server-Sent Events stream notifying when a queued plan is ready",
+    status_code=200,
+    response_class=StreamingResponse,
+)
+async def watch_plan(
+    plan_request_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-            user_id = get_user_id(credentials)
-            queue_plan(user_id, plan_metadata)
+        watch = plan_watcher.get(plan_request_id, user.user_id)
 
-            return "Plan queued"
+        return StreamingResponse(
+            plan_watcher.events(watch), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS
+        )
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
 
 
 @router.get("/plan/user", tags=["Planner"])
-def get_plan(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_plan(user: AuthenticatedUser = Depends(get_authenticated_user)):
     try:
-        if check_authentication(credentials):
-            user_id = get_user_id(credentials)
-            response = requests.get(f"{PLANNER_URL}/plan/user/{user_id}")
+        user_id = user.user_id
+        response = await upstream_client.get(PLANNER, f"/plan/user/{user_id}")
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            return response.json()
+        return response.json()
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
 
@@ -51,16 +72,15 @@ def get_plan(credentials: HTTPAuthorizationCredentials = Depends(security)):
     description="Get plan by id",
     status_code=200,
 )
-def get_plan_by_id(
-    plan_id: str, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def get_plan_by_id(
+    plan_id: str, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.get(f"{PLANNER_URL}/plan/{plan_id}")
+        response = await upstream_client.get(PLANNER, f"/plan/{plan_id}")
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
 
-            return response.json()
+        return response.json()
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
 
@@ -71,17 +91,16 @@ def get_plan_by_id(
     description="Delete attraction from a plan",
     status_code=200,
 )
-def delete_attraction(
+async def delete_attraction(
     attraction: AttractionPlan,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.delete(
-                f"{PLANNER_URL}/plan/attraction", json=attraction.dict()
-            )
+        response = await upstream_client.delete(
+            PLANNER, "/plan/attraction", json=attraction.dict()
+        )
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
 
@@ -92,17 +111,16 @@ def delete_attraction(
     description="Update attraction from a plan",
     status_code=200,
 )
-def update_attraction(
+async def update_attraction(
     attraction: AttractionPlan,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.patch(
-                f"{PLANNER_URL}/plan/attraction", json=attraction.dict()
-            )
+        response = await upstream_client.patch(
+            PLANNER, "/plan/attraction", json=attraction.dict()
+        )
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
 
@@ -113,14 +131,13 @@ def update_attraction(
     description="Delete plan",
     status_code=200,
 )
-def delete_plan(
+async def delete_plan(
     plan_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.delete(f"{PLANNER_URL}/plan/{plan_id}")
+        response = await upstream_client.delete(PLANNER, f"/plan/{plan_id}")
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
     except APIException as e:
         raise APIExceptionToHTTP().convert(e)
@@ -1,20 +1,18 @@
-import os
 from datetime import datetime
 from typing import Annotated
 
-import requests
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from app.schemas.users_schemas.autentication import *
 from app.schemas.users_schemas.users import User, UserCreate, UserId, UserLogin
+from app.services.authentication_service import get_authenticated_user
 from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import AUTHENTICATION, upstream_client
 from app.utils.api_exception import *
 from app.utils.api_exception import APIException, APIExceptionToHTTP
 from app.utils.constants import *
 
-AUTHENTICATION_URL = os.getenv("AUTHENTICATION_URL")
-
 router = APIRouter()
 security = HTTPBearer()
 
@@ -27,22 +25,10 @@ security = HTTPBearer()
     status_code=200,
     description="Authenticate user by the jwt token",
 )
-def verify_id_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        response = requests.get(
-            f"{AUTHENTICATION_URL}/users/verify_id_token",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-        )
-
-        handle_response_error(200, response)
-
-        authenticated_id = response.json()
-
-        return UserId.model_construct(id=int(authenticated_id))
-    except HTTPException as e:
-        raise e
-    except APIException as e:
-        raise APIExceptionToHTTP().convert(e)
+async def verify_id_token(
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
+    return UserId.model_construct(id=user.user_id)
 
 
 @router.post(
@@ -52,12 +38,13 @@ def verify_id_token(credentials: HTTPAuthorizationCredentials = Depends(security
     response_model=Token,
     description="Refresh user token",
 )
-def refresh_token(
+async def refresh_token(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
 ):
     try:
-        response = requests.post(
-            f"{AUTHENTICATION_URL}/users/refresh_token",
+        response = await upstream_client.post(
+            AUTHENTICATION,
+            "/users/refresh_token",
             headers={"Authorization": f"Bearer {credentials.credentials}"},
         )
 
@@ -86,7 +73,7 @@ def refresh_token(
     response_model=User,
     description="Create a new user in the database",
 )
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate):
     try:
         user_data = {
             "username": user.username,
@@ -98,7 +85,9 @@ def create_user(user: UserCreate):
             "fcm_token": user.fcm_token,
         }
 
-        response = requests.post(f"{AUTHENTICATION_URL}/users/signup", json=user_data)
+        response = await upstream_client.post(
+            AUTHENTICATION, "/users/signup", json=user_data
+        )
 
         handle_response_error(201, response)
 
@@ -128,14 +117,16 @@ def create_user(user: UserCreate):
     response_model=Token,
     description="Generate a token for valid credentials",
 )
-def login_user(user: UserLogin):
+async def login_user(user: UserLogin):
     try:
         user_data = {
             "email": user.email,
             "password": user.password,
         }
 
-        response = requests.post(f"{AUTHENTICATION_URL}/users/login", json=user_data)
+        response = await upstream_client.post(
+            AUTHENTICATION, "/users/login", json=user_data
+        )
 
         handle_response_error(200, response)
 
@@ -1,25 +1,25 @@
-import os
 from datetime import datetime
 from typing import Annotated
 
-import requests
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app.schemas.users_schemas.autentication import AuthenticatedUser
 from app.schemas.users_schemas.password import (
     InitRecoverPassword,
     PasswordRecover,
     UpdatePassword,
     UpdateRecoverPassword,
 )
-from app.services.authentication_service import check_authentication
+from app.services.authentication_service import (
+    forget_user_tokens,
+    get_authenticated_user,
+    token_cache,
+)
 from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import AUTHENTICATION, upstream_client
 from app.utils.api_exception import APIException, APIExceptionToHTTP
 
-AUTHENTICATION_URL = os.getenv("AUTHENTICATION_URL")
-
 router = APIRouter()
-security = HTTPBearer()
 
 # UPDATE PASSWORD
 
@@ -30,26 +30,24 @@ security = HTTPBearer()
     status_code=200,
     description="Receives the current and new passwords and updates it if the current password is correct",
 )
-def update_password(
+async def update_password(
     update_data: UpdatePassword,
-    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    user: Annotated[AuthenticatedUser, Depends(get_authenticated_user)],
 ):
     try:
-        if check_authentication(credentials):
-
-            response = requests.patch(
-                f"{AUTHENTICATION_URL}/users/password/update",
-                json=update_data.dict(),
-                headers={
-                    "Authorization": f"{credentials.scheme} {credentials.credentials}"
-                },
-            )
+        response = await upstream_client.patch(
+            AUTHENTICATION,
+            "/users/password/update",
+            json=update_data.dict(),
+            headers={"Authorization": f"Bearer {user.token}"},
+        )
 
-            handle_response_error(200, response)
+        handle_response_error(200, response)
+        forget_user_tokens(user.user_id)
 
-            new_password = response.json()
+        new_password = response.json()
 
-            return response.json()
+        return response.json()
 
     except HTTPException as e:
         raise e
@@ -67,13 +65,14 @@ def update_password(
     response_model=PasswordRecover,
     description="Send code by email to recover the password",
 )
-def init_recover_password(
+async def init_recover_password(
     recover_data: InitRecoverPassword,
 ):
     try:
 
-        response = requests.post(
-            f"{AUTHENTICATION_URL}/users/password/recover",
+        response = await upstream_client.post(
+            AUTHENTICATION,
+            "/users/password/recover",
             json=recover_data.dict(),
         )
 
@@ -104,14 +103,18 @@ def init_recover_password(
     status_code=200,
     description="Receive the code and the new password and update it if the code match",
 )
-def recover_password(recover_data: UpdateRecoverPassword):
+async def recover_password(recover_data: UpdateRecoverPassword):
     try:
-        response = requests.put(
-            f"{AUTHENTICATION_URL}/users/password/recover",
+        response = await upstream_client.put(
+            AUTHENTICATION,
+            "/users/password/recover",
             json=recover_data.dict(),
         )
 
         handle_response_error(200, response)
+        # Only the email is known here, recoveries are rare enough to drop
+        # every cached token rather than keep one of this user
+        token_cache.clear()
 
     except HTTPException as e:
         raise e
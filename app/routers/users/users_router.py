@@ -1,21 +1,20 @@
-import os
 from datetime import datetime
-from typing import Annotated
 
-import requests
-from fastapi import APIRouter, Depends, File, UploadFile
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi import APIRouter, Depends, Request
 
+from app.schemas.users_schemas.autentication import AuthenticatedUser
 from app.schemas.users_schemas.users import User, UserBase
-from app.services.authentication_service import check_authentication, get_user_id
+from app.services.authentication_service import (
+    forget_user_tokens,
+    get_authenticated_user,
+)
+from app.services.avatar_service import avatar_upload
 from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import AUTHENTICATION, upstream_client
 from app.utils.api_exception import APIException, APIExceptionToHTTP, HTTPException
 from app.utils.constants import *
 
-AUTHENTICATION_URL = os.getenv("AUTHENTICATION_URL")
-
 router = APIRouter()
-security = HTTPBearer()
 
 # Get user
 
@@ -27,25 +26,25 @@ security = HTTPBearer()
     response_model=User,
     description="Get user profile",
 )
-def get_user_profile(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_user_profile(
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
     try:
-        user_id = get_user_id(credentials)
-        if user_id:
-            response = requests.get(f"{AUTHENTICATION_URL}/users/{user_id}")
-
-            handle_response_error(200, response)
-
-            response_data = response.json()
-
-            return User.model_construct(
-                id=response_data["id"],
-                username=response_data["username"],
-                email=response_data["email"],
-                birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
-                preferences=response_data["preferences"],
-                city=response_data["city"],
-                avatar_link=response_data["avatar_link"],
-            )
+        response = await upstream_client.get(AUTHENTICATION, f"/users/{user.user_id}")
+
+        handle_response_error(200, response)
+
+        response_data = response.json()
+
+        return User.model_construct(
+            id=response_data["id"],
+            username=response_data["username"],
+            email=response_data["email"],
+            birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
+            preferences=response_data["preferences"],
+            city=response_data["city"],
+            avatar_link=response_data["avatar_link"],
+        )
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -62,30 +61,30 @@ def get_user_profile(credentials: HTTPAuthorizationCredentials = Depends(securit
     response_model=User,
     description="Update user profile",
 )
-def update_user_profile(
-    updatedUser: UserBase, credentials: HTTPAuthorizationCredentials = Depends(security)
+async def update_user_profile(
+    updatedUser: UserBase, user: AuthenticatedUser = Depends(get_authenticated_user)
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.patch(
-                f"{AUTHENTICATION_URL}/users",
-                json=updatedUser.dict(),
-                headers={"Authorization": f"Bearer {credentials.credentials}"},
-            )
-
-            handle_response_error(200, response)
-
-            response_data = response.json()
-
-            return User.model_construct(
-                id=response_data["id"],
-                username=response_data["username"],
-                email=response_data["email"],
-                birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
-                preferences=response_data["preferences"],
-                city=response_data["city"],
-                avatar_link=response_data["avatar_link"],
-            )
+        response = await upstream_client.patch(
+            AUTHENTICATION,
+            "/users",
+            json=updatedUser.dict(),
+            headers={"Authorization": f"Bearer {user.token}"},
+        )
+
+        handle_response_error(200, response)
+
+        response_data = response.json()
+
+        return User.model_construct(
+            id=response_data["id"],
+            username=response_data["username"],
+            email=response_data["email"],
+            birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
+            preferences=response_data["preferences"],
+            city=response_data["city"],
+            avatar_link=response_data["avatar_link"],
+        )
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -98,32 +97,48 @@ def update_user_profile(
     status_code=200,
     response_model=User,
     description="Update user avatar",
+    # The body is forwarded by avatar_upload, documented by hand
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "avatar": {"type": "string", "format": "binary"}
+                        },
+                        "required": ["avatar"],
+                    }
+                }
+            },
+        }
+    },
 )
-def update_user_avatar(
-    avatar: Annotated[UploadFile, File()],
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+async def update_user_avatar(
+    request: Request,
+    user: AuthenticatedUser = Depends(get_authenticated_user),
 ):
     try:
-        if check_authentication(credentials):
-            response = requests.post(
-                f"{AUTHENTICATION_URL}/users/avatar",
-                headers={"Authorization": f"Bearer {credentials.credentials}"},
-                files=[("avatar", (avatar.filename, avatar.file, avatar.content_type))],
-            )
-
-            handle_response_error(200, response)
-
-            response_data = response.json()
-
-            return User.model_construct(
-                id=response_data["id"],
-                username=response_data["username"],
-                email=response_data["email"],
-                birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
-                preferences=response_data["preferences"],
-                city=response_data["city"],
-                avatar_link=response_data["avatar_link"],
-            )
+        response = await upstream_client.post(
+            AUTHENTICATION,
+            "/users/avatar",
+            **await avatar_upload(request, user.token),
+        )
+
+        handle_response_error(200, response)
+
+        response_data = response.json()
+
+        return User.model_construct(
+            id=response_data["id"],
+            username=response_data["username"],
+            email=response_data["email"],
+            birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
+            preferences=response_data["preferences"],
+            city=response_data["city"],
+            avatar_link=response_data["avatar_link"],
+        )
     except HTTPException as e:
         raise e
     except APIException as e:
@@ -140,27 +155,31 @@ def update_user_avatar(
     response_model=User,
     description="Delete user profile",
 )
-def delete_user_profile(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def delete_user_profile(
+    user: AuthenticatedUser = Depends(get_authenticated_user),
+):
     try:
-        if check_authentication(credentials):
-            response = requests.delete(
-                f"{AUTHENTICATION_URL}/users",
-                headers={"Authorization": f"Bearer {credentials.credentials}"},
-            )
-
-            handle_response_error(200, response)
-
-            response_data = response.json()
-
-            return User.model_construct(
-                id=response_data["id"],
-                username=response_data["username"],
-                email=response_data["email"],
-                birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
-                preferences=response_data["preferences"],
-                city=response_data["city"],
-                avatar_link=response_data["avatar_link"],
-            )
+        response = await upstream_client.delete(
+            AUTHENTICATION,
+            "/users",
+            headers={"Authorization": f"Bearer {user.token}"},
+        )
+
+        handle_response_error(200, response)
+        # No session may keep authenticating the deleted account
+        forget_user_tokens(user.user_id)
+
+        response_data = response.json()
+
+        return User.model_construct(
+            id=response_data["id"],
+            username=response_data["username"],
+            email=response_data["email"],
+            birth_date=datetime.fromisoformat(response_data["birth_date"]).date(),
+            preferences=response_data["preferences"],
+            city=response_data["city"],
+            avatar_link=response_data["avatar_link"],
+        )
     except HTTPException as e:
         raise e
     except APIException as e:
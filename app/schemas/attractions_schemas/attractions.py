@@ -1,7 +1,10 @@
+import os
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+ATTRACTIONS_BATCH_MAX_SIZE = int(os.getenv("ATTRACTIONS_BATCH_MAX_SIZE", "50"))
 
 
 class Location(BaseModel):
@@ -91,3 +94,16 @@ class InteractiveAttraction(BaseModel):
     attraction_name: str
     attraction_country: str
     attraction_city: str
+
+
+class AttractionsBatch(BaseModel):
+    attraction_ids: List[str] = Field(
+        min_length=1, max_length=ATTRACTIONS_BATCH_MAX_SIZE
+    )
+
+
+class AttractionBatchItem(BaseModel):
+    attraction_id: str
+    status_code: int
+    attraction: Optional[AttractionByUser] = None
+    error: Optional[str] = None
@@ -0,0 +1,22 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "10"))
+
+
+class SubRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    query: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest] = Field(min_length=1, max_length=BATCH_MAX_REQUESTS)
+
+
+class SubResponse(BaseModel):
+    status_code: int
+    body: Optional[Any] = None
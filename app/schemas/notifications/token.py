@@ -1,4 +1,5 @@
 from pydantic import BaseModel
 
+
 class FcmToken(BaseModel):
-  fcm_token: str
\ No newline at end of file
+    fcm_token: str
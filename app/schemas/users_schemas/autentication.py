@@ -5,3 +5,8 @@ class Token(BaseModel):
     token: str
     refresh_token: str
     token_type: str
+
+
+class AuthenticatedUser(BaseModel):
+    user_id: int
+    token: str
@@ -1,11 +1,166 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException, status
+
 from app.schemas.attractions_schemas.attractions import (
     Attraction,
+    AttractionBatchItem,
     AttractionByUser,
     Location,
 )
+from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import ATTRACTIONS, upstream_client
+from app.utils.api_exception import APIException, APIExceptionToHTTP
+from app.utils.metrics import register_metrics
+from app.utils.ttl_cache import TTLCache
+
+ATTRACTION_CACHE_TTL = float(os.getenv("ATTRACTION_CACHE_TTL", "60"))
+ATTRACTION_CACHE_MAX_SIZE = int(os.getenv("ATTRACTION_CACHE_MAX_SIZE", "5000"))
+USER_ATTRACTION_CACHE_TTL = float(os.getenv("USER_ATTRACTION_CACHE_TTL", "60"))
+USER_ATTRACTION_CACHE_MAX_SIZE = int(
+    os.getenv("USER_ATTRACTION_CACHE_MAX_SIZE", "50000")
+)
+ATTRACTIONS_BATCH_CONCURRENCY = int(os.getenv("ATTRACTIONS_BATCH_CONCURRENCY", "8"))
+
+logger = logging.getLogger(__name__)
+
+# Fields of AttractionByUser that depend on the user asking for the attraction
+USER_ATTRACTION_FIELDS = ("is_liked", "is_saved", "is_done", "user_rating")
+
+# attraction_id -> attraction detail shared by every user
+attraction_cache = TTLCache(max_size=ATTRACTION_CACHE_MAX_SIZE)
+# (user_id, attraction_id) -> USER_ATTRACTION_FIELDS
+user_attraction_cache = TTLCache(max_size=USER_ATTRACTION_CACHE_MAX_SIZE)
+register_metrics("attraction_cache", attraction_cache.stats)
+register_metrics("user_attraction_cache", user_attraction_cache.stats)
+
+
+def split_attraction_by_user(data: dict) -> Tuple[dict, dict]:
+    shared_data = {
+        key: value for key, value in data.items() if key not in USER_ATTRACTION_FIELDS
+    }
+    user_data = {field: data[field] for field in USER_ATTRACTION_FIELDS}
+    return shared_data, user_data
+
+
+def get_cached_attraction(
+    attraction_id: str, user_id: int
+) -> Tuple[Optional[dict], Optional[dict]]:
+    return (
+        attraction_cache.get(attraction_id),
+        user_attraction_cache.get((user_id, attraction_id)),
+    )
+
+
+def cache_attraction(attraction_id: str, user_id: int, data: dict):
+    shared_data, user_data = split_attraction_by_user(data)
+    attraction_cache.set(attraction_id, shared_data, ATTRACTION_CACHE_TTL)
+    user_attraction_cache.set(
+        (user_id, attraction_id), user_data, USER_ATTRACTION_CACHE_TTL
+    )
+
+
+def invalidate_attraction(attraction_id: str, user_id: Optional[int] = None):
+    # Counters, ratings and comments are shared, user flags only for user_id
+    attraction_cache.delete(attraction_id)
+    if user_id is not None:
+        user_attraction_cache.delete((user_id, attraction_id))
+
+
+def invalidate_comment(comment_id: int):
+    # Comment routes only carry the comment id, drop the cached attraction
+    # that holds it
+    attraction_cache.delete_where(
+        lambda _, shared_data: any(
+            comment.get("comment_id") == comment_id
+            for comment in shared_data.get("comments") or []
+        )
+    )
+
+
+def invalidate_user_attraction(attraction_id: str, user_id: int):
+    user_attraction_cache.delete((user_id, attraction_id))
+
+
+async def fetch_attraction_by_id(attraction_id: str, user_id: int) -> AttractionByUser:
+    shared_data, user_data = get_cached_attraction(attraction_id, user_id)
+
+    if shared_data is None or user_data is None:
+        response = await upstream_client.get(
+            ATTRACTIONS,
+            f"/attractions/byid/{attraction_id}",
+            params={"user_id": user_id},
+            hedge=True,
+        )
+
+        handle_response_error(200, response)
+
+        attraction_data = response.json()
+        cache_attraction(attraction_id, user_id, attraction_data)
+
+        return parse_attraction_by_id(attraction_data)
+
+    return parse_attraction_by_id(shared_data, user_data)
+
+
+async def fetch_attraction_batch_item(
+    attraction_id: str, user_id: int, semaphore: asyncio.Semaphore
+) -> AttractionBatchItem:
+    try:
+        async with semaphore:
+            attraction = await fetch_attraction_by_id(attraction_id, user_id)
+        return AttractionBatchItem.model_construct(
+            attraction_id=attraction_id,
+            status_code=status.HTTP_200_OK,
+            attraction=attraction,
+            error=None,
+        )
+    except APIException as e:
+        error = APIExceptionToHTTP().convert(e)
+    except HTTPException as e:
+        error = e
+    except httpx.RequestError:
+        error = HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Error de conexión con el servicio de atracciones",
+        )
+    except Exception:
+        # One broken attraction must not fail the whole batch
+        logger.exception("Error fetching attraction %s", attraction_id)
+        error = HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error obteniendo la atracción",
+        )
+
+    return AttractionBatchItem.model_construct(
+        attraction_id=attraction_id,
+        status_code=error.status_code,
+        attraction=None,
+        error=str(error.detail),
+    )
+
+
+async def fetch_attractions_batch(
+    attraction_ids: List[str], user_id: int
+) -> List[AttractionBatchItem]:
+    semaphore = asyncio.Semaphore(ATTRACTIONS_BATCH_CONCURRENCY)
+    # gather keeps the results in the same order as the requested ids
+    return await asyncio.gather(
+        *[
+            fetch_attraction_batch_item(attraction_id, user_id, semaphore)
+            for attraction_id in attraction_ids
+        ]
+    )
+
 
+def parse_attraction_by_id(data: dict, user_data: Optional[dict] = None):
+    if user_data is None:
+        user_data = data
 
-def parse_attraction_by_id(data: dict):
     return AttractionByUser.model_construct(
         attraction_id=data["attraction_id"],
         attraction_name=data["attraction_name"],
@@ -19,10 +174,10 @@ def parse_attraction_by_id(data: dict):
         comments=data["comments"],
         avg_rating=data["avg_rating"],
         liked_count=data["liked_count"],
-        is_liked=data["is_liked"],
-        is_saved=data["is_saved"],
-        user_rating=data["user_rating"],
-        is_done=data["is_done"],
+        is_liked=user_data["is_liked"],
+        is_saved=user_data["is_saved"],
+        user_rating=user_data["user_rating"],
+        is_done=user_data["is_done"],
         types=data["types"],
         editorial_summary=data["editorial_summary"],
         google_maps_uri=data["google_maps_uri"],
@@ -1,52 +1,242 @@
+import base64
+import hashlib
+import json
 import os
-from typing import Optional
+import time
+from typing import TYPE_CHECKING, Dict, Optional
 
-import requests
+import httpx
+from fastapi import Depends, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.utils.api_exception import APIException
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.upstream_client import AUTHENTICATION, upstream_client
+from app.utils.api_exception import APIException, APIExceptionToHTTP
 from app.utils.constants import *
+from app.utils.metrics import register_metrics
+from app.utils.ttl_cache import TTLCache
 
-AUTHENTICATION_URL = os.getenv("AUTHENTICATION_URL")
+if TYPE_CHECKING:
+    import jwt
+
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", "5"))
+
+# "remote" asks the authentication service to verify every token, "local"
+# checks the JWT signature in the gateway against the service signing keys
+REMOTE_VERIFICATION = "remote"
+LOCAL_VERIFICATION = "local"
+AUTH_VERIFICATION_MODE = os.getenv("AUTH_VERIFICATION_MODE", REMOTE_VERIFICATION)
+AUTH_JWKS_PATH = os.getenv("AUTH_JWKS_PATH", "/.well-known/jwks.json")
+AUTH_JWKS_MIN_REFRESH_INTERVAL = float(
+    os.getenv("AUTH_JWKS_MIN_REFRESH_INTERVAL", "30")
+)
+AUTH_JWT_ALGORITHMS = os.getenv("AUTH_JWT_ALGORITHMS", "RS256").split(",")
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE")
+AUTH_JWT_ISSUER = os.getenv("AUTH_JWT_ISSUER")
+AUTH_USER_ID_CLAIM = os.getenv("AUTH_USER_ID_CLAIM", "sub")
 
 security = HTTPBearer()
 
+# Cached value for tokens the authentication service rejected
+REJECTED_TOKEN = object()
+
+token_cache = TTLCache(max_size=TOKEN_CACHE_MAX_SIZE)
+register_metrics("token_cache", token_cache.stats)
+
+
+def token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
-def check_authentication(credentials: HTTPAuthorizationCredentials) -> Optional[bool]:
+
+def forget_user_tokens(user_id: int):
+    # Every cached session of the user, not just the token of this request
+    token_cache.delete_where(lambda _, cached_user_id: cached_user_id == user_id)
+
+
+def get_token_expiration(token: str) -> Optional[float]:
+    # Only used to bound the cache TTL, the signature is checked elsewhere
     try:
-        response = requests.get(
-            f"{AUTHENTICATION_URL}/users/verify_id_token",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def token_cache_ttl(token: str) -> float:
+    ttl = TOKEN_CACHE_TTL
+    expiration = get_token_expiration(token)
+    if expiration is not None:
+        ttl = min(ttl, expiration - time.time())
+    return ttl
+
+
+class SigningKeys:
+    """
+    Signing keys published by the authentication service, indexed by key id.
+    Keys are only fetched again when a token references an unknown key id,
+    which is what happens after a key rotation.
+    """
+
+    def __init__(self):
+        self.keys: Dict[str, "jwt.PyJWK"] = {}
+        self.fetched_at: Optional[float] = None
+
+    async def refresh(self):
+        # PyJWT pulls in cryptography, only load it when local mode needs it
+        import jwt
+
+        try:
+            response = await upstream_client.get(AUTHENTICATION, AUTH_JWKS_PATH)
+        except httpx.RequestError:
+            raise APIException(
+                code=CONNECTION_ERROR,
+                msg="Error de conexión con el servidor de autenticación",
+            )
+        self.fetched_at = time.monotonic()
+
+        if response.status_code != 200:
+            raise APIException(
+                code=CONNECTION_ERROR,
+                msg="Error obteniendo las claves del servidor de autenticación",
+            )
+
+        try:
+            jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        except (AttributeError, ValueError, jwt.PyJWTError):
+            # Not JSON, not a key set or no usable key in it
+            raise APIException(
+                code=CONNECTION_ERROR,
+                msg="Claves inválidas recibidas del servidor de autenticación",
+            )
+        self.keys = {key.key_id: key for key in jwk_set.keys}
+
+    def can_refresh(self) -> bool:
+        return (
+            self.fetched_at is None
+            or time.monotonic() - self.fetched_at >= AUTH_JWKS_MIN_REFRESH_INTERVAL
         )
 
-        if response.status_code == 200:
-            return True
-        else:
+    async def get(self, key_id: str) -> "jwt.PyJWK":
+        if key_id not in self.keys and self.can_refresh():
+            await self.refresh()
+
+        key = self.keys.get(key_id)
+        if key is None:
             raise APIException(
                 code=INVALID_CREDENTIALS_ERROR, msg="INVALID_CREDENTIALS_ERROR"
             )
-    except requests.RequestException:
+        return key
+
+    def clear(self):
+        self.keys = {}
+        self.fetched_at = None
+
+
+signing_keys = SigningKeys()
+
+
+async def verify_id_token_remotely(token: str) -> int:
+    try:
+        response = await upstream_client.get(
+            AUTHENTICATION,
+            "/users/verify_id_token",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    except httpx.RequestError:
         raise APIException(
             code=CONNECTION_ERROR,
             msg="Error de conexión con el servidor de autenticación",
         )
 
+    # Only explicit rejections, a throttled (429) or otherwise failed check
+    # says nothing about the token and must not get it negative cached
+    if response.status_code in (401, 403):
+        raise APIException(
+            code=INVALID_CREDENTIALS_ERROR, msg="INVALID_CREDENTIALS_ERROR"
+        )
+    if response.status_code != 200:
+        raise APIException(
+            code=CONNECTION_ERROR,
+            msg="Error de conexión con el servidor de autenticación",
+        )
+
+    return int(response.json())
+
+
+async def verify_id_token_locally(token: str) -> int:
+    import jwt
 
-def get_user_id(credentials: HTTPAuthorizationCredentials) -> int:
     try:
-        response = requests.get(
-            f"{AUTHENTICATION_URL}/users/verify_id_token",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
+        key_id = jwt.get_unverified_header(token).get("kid")
+    except jwt.InvalidTokenError:
+        raise APIException(
+            code=INVALID_CREDENTIALS_ERROR, msg="INVALID_CREDENTIALS_ERROR"
         )
 
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise APIException(
-                code=INVALID_CREDENTIALS_ERROR, msg="INVALID_CREDENTIALS_ERROR"
-            )
-    except requests.RequestException:
+    key = await signing_keys.get(key_id)
+
+    try:
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=AUTH_JWT_ALGORITHMS,
+            audience=AUTH_JWT_AUDIENCE,
+            issuer=AUTH_JWT_ISSUER,
+            options={
+                "require": ["exp"],
+                "verify_aud": AUTH_JWT_AUDIENCE is not None,
+            },
+        )
+        return int(claims[AUTH_USER_ID_CLAIM])
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
         raise APIException(
-            code=CONNECTION_ERROR,
-            msg="Error de conexión con el servidor de autenticación",
+            code=INVALID_CREDENTIALS_ERROR, msg="INVALID_CREDENTIALS_ERROR"
+        )
+
+
+async def verify_id_token(token: str) -> int:
+    key = token_cache_key(token)
+    cached_user_id = token_cache.get(key)
+    if cached_user_id is REJECTED_TOKEN:
+        raise APIException(
+            code=INVALID_CREDENTIALS_ERROR, msg="INVALID_CREDENTIALS_ERROR"
         )
+    if cached_user_id is not None:
+        return cached_user_id
+
+    try:
+        if AUTH_VERIFICATION_MODE == LOCAL_VERIFICATION:
+            user_id = await verify_id_token_locally(token)
+        else:
+            user_id = await verify_id_token_remotely(token)
+    except APIException as e:
+        # Only cache explicit rejections, never auth service failures
+        if e.get_code() == INVALID_CREDENTIALS_ERROR:
+            token_cache.set(key, REJECTED_TOKEN, TOKEN_CACHE_NEGATIVE_TTL)
+        raise e
+
+    token_cache.set(key, user_id, token_cache_ttl(token))
+
+    return user_id
+
+
+async def get_authenticated_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> AuthenticatedUser:
+    # Sub-requests of a /batch call reuse the identity the batch verified
+    batch_user = getattr(request.state, "authenticated_user", None)
+    if batch_user is not None and batch_user.token == credentials.credentials:
+        return batch_user
+
+    try:
+        user_id = await verify_id_token(credentials.credentials)
+    except APIException as e:
+        raise APIExceptionToHTTP().convert(e)
+
+    return AuthenticatedUser.model_construct(
+        user_id=user_id, token=credentials.credentials
+    )
@@ -0,0 +1,183 @@
+import asyncio
+import importlib.util
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+
+# Above the 5-12 MB phone photos clients upload today
+AVATAR_MAX_SIZE = int(os.getenv("AVATAR_MAX_SIZE", str(20 * 1024 * 1024)))
+# Avatars are downscaled only when set (in pixels) and Pillow is installed
+AVATAR_MAX_DIMENSION = int(os.getenv("AVATAR_MAX_DIMENSION", "0"))
+AVATAR_FORMAT = os.getenv("AVATAR_FORMAT", "WEBP")
+AVATAR_QUALITY = int(os.getenv("AVATAR_QUALITY", "80"))
+# Upload limit when avatars are downscaled, only the re-encoded copy has to
+# fit in AVATAR_MAX_SIZE
+AVATAR_RESIZE_MAX_INPUT = int(
+    os.getenv("AVATAR_RESIZE_MAX_INPUT", str(40 * 1024 * 1024))
+)
+AVATAR_RESIZE_WORKERS = int(os.getenv("AVATAR_RESIZE_WORKERS", "2"))
+
+AVATAR_FIELD = "avatar"
+
+avatar_pool: Optional[ProcessPoolExecutor] = None
+
+
+def avatar_too_large_error(max_size: int) -> APIException:
+    return APIException(
+        code=PAYLOAD_TOO_LARGE_ERROR,
+        msg=f"El avatar supera el tamaño máximo de {max_size} bytes",
+    )
+
+
+def check_avatar_request(request: Request, max_size: int):
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise APIException(
+            code=UNSUPPORTED_MEDIA_TYPE_ERROR,
+            msg="El avatar debe enviarse como multipart/form-data",
+        )
+
+    # Reject early when the client announces the size
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit():
+        if int(content_length) > max_size:
+            raise avatar_too_large_error(max_size)
+
+
+async def stream_avatar(request: Request) -> AsyncIterator[bytes]:
+    # Chunks go straight to the upstream request, nothing is spooled to disk
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > AVATAR_MAX_SIZE:
+            raise avatar_too_large_error(AVATAR_MAX_SIZE)
+        yield chunk
+
+
+def avatar_upload_headers(request: Request, token: str) -> dict:
+    # The multipart boundary lives in the content type, it must be kept as is
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": request.headers["content-type"],
+    }
+    if "content-length" in request.headers:
+        headers["Content-Length"] = request.headers["content-length"]
+    return headers
+
+
+def avatar_resize_enabled() -> bool:
+    return AVATAR_MAX_DIMENSION > 0 and importlib.util.find_spec("PIL") is not None
+
+
+def resize_image(
+    data: bytes, max_dimension: int, image_format: str, quality: int
+) -> Optional[bytes]:
+    # Runs in a worker process, Pillow is only imported there
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Apply the EXIF rotation before the metadata is dropped
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimension, max_dimension))
+            if image.mode not in ("RGB", "RGBA") or (
+                image_format.upper() == "JPEG" and image.mode == "RGBA"
+            ):
+                image = image.convert("RGB")
+
+            # Saving without exif/icc arguments leaves all metadata behind
+            output = io.BytesIO()
+            image.save(output, format=image_format, quality=quality)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Unknown format, truncated file or decompression bomb
+        return None
+
+
+def get_avatar_pool() -> ProcessPoolExecutor:
+    global avatar_pool
+    if avatar_pool is None:
+        # Spawned workers do not inherit the event loop and client threads
+        avatar_pool = ProcessPoolExecutor(
+            max_workers=AVATAR_RESIZE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return avatar_pool
+
+
+def shutdown_avatar_pool():
+    global avatar_pool
+    if avatar_pool is not None:
+        avatar_pool.shutdown(wait=False, cancel_futures=True)
+        avatar_pool = None
+
+
+async def downscale_avatar(data: bytes) -> bytes:
+    loop = asyncio.get_running_loop()
+    avatar = await loop.run_in_executor(
+        get_avatar_pool(),
+        resize_image,
+        data,
+        AVATAR_MAX_DIMENSION,
+        AVATAR_FORMAT,
+        AVATAR_QUALITY,
+    )
+    if avatar is None:
+        raise APIException(
+            code=INVALID_IMAGE_ERROR, msg="El avatar no es una imagen válida"
+        )
+    if len(avatar) > AVATAR_MAX_SIZE:
+        raise avatar_too_large_error(AVATAR_MAX_SIZE)
+    return avatar
+
+
+def size_limited_request(request: Request, max_size: int) -> Request:
+    size = 0
+
+    async def receive():
+        nonlocal size
+        message = await request.receive()
+        size += len(message.get("body", b""))
+        if size > max_size:
+            raise avatar_too_large_error(max_size)
+        return message
+
+    return Request(request.scope, receive)
+
+
+async def read_avatar(request: Request) -> bytes:
+    form = await size_limited_request(request, AVATAR_RESIZE_MAX_INPUT).form()
+    avatar = form.get(AVATAR_FIELD)
+    if avatar is None or isinstance(avatar, str):
+        raise APIException(code=INVALID_IMAGE_ERROR, msg="Falta el archivo del avatar")
+    try:
+        return await avatar.read()
+    finally:
+        await form.close()
+
+
+async def avatar_upload(request: Request, token: str) -> dict:
+    if not avatar_resize_enabled():
+        check_avatar_request(request, AVATAR_MAX_SIZE)
+        return {
+            "headers": avatar_upload_headers(request, token),
+            "content": stream_avatar(request),
+        }
+
+    # Decoding needs the whole image, only the small re-encoded copy is sent
+    check_avatar_request(request, AVATAR_RESIZE_MAX_INPUT)
+    avatar = await downscale_avatar(await read_avatar(request))
+    image_format = AVATAR_FORMAT.lower()
+    return {
+        "headers": {"Authorization": f"Bearer {token}"},
+        "files": [
+            (AVATAR_FIELD, (f"avatar.{image_format}", avatar, f"image/{image_format}"))
+        ],
+    }
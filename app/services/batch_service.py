@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import os
+import urllib.parse
+from typing import List, Optional
+
+from fastapi import status
+from starlette.types import ASGIApp, Message
+
+from app.schemas.batch_schemas.batch import SubRequest, SubResponse
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.deadline import remaining_time
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+# Server-Sent Events routes would hold the whole batch open until they end
+BATCH_STREAMING_PATHS = ("/plan/events/", "/chatbot/send_message/stream")
+
+logger = logging.getLogger(__name__)
+
+
+def validate_sub_request(sub_request: SubRequest) -> Optional[SubResponse]:
+    if sub_request.method.upper() not in BATCH_METHODS:
+        return SubResponse.model_construct(
+            status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+            body={"detail": f"Method {sub_request.method} not allowed in a batch"},
+        )
+    path = urllib.parse.urlsplit(sub_request.path).path
+    if (
+        not path.startswith("/")
+        or path.rstrip("/") == "/batch"
+        or path.startswith(BATCH_STREAMING_PATHS)
+    ):
+        return SubResponse.model_construct(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            body={"detail": f"Path {sub_request.path} not allowed in a batch"},
+        )
+    return None
+
+
+def build_scope(
+    sub_request: SubRequest, user: AuthenticatedUser, parent_scope: dict, body: bytes
+) -> dict:
+    split_path = urllib.parse.urlsplit(sub_request.path)
+    query_string = split_path.query
+    if sub_request.query:
+        query_string = "&".join(
+            part
+            for part in (
+                query_string,
+                urllib.parse.urlencode(sub_request.query, doseq=True),
+            )
+            if part
+        )
+
+    headers = [
+        (b"authorization", f"Bearer {user.token}".encode()),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if body:
+        headers.append((b"content-type", b"application/json"))
+
+    # The identity verified by the batch request is reused by every
+    # sub-request, see get_authenticated_user
+    state = dict(parent_scope.get("state", {}))
+    state["authenticated_user"] = user
+
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": sub_request.method.upper(),
+        "scheme": parent_scope.get("scheme", "http"),
+        "server": parent_scope.get("server"),
+        "client": parent_scope.get("client"),
+        "root_path": parent_scope.get("root_path", ""),
+        "path": split_path.path,
+        "raw_path": split_path.path.encode(),
+        "query_string": query_string.encode(),
+        "headers": headers,
+        "state": state,
+    }
+
+
+def parse_body(body: bytes, content_type: str):
+    if not body:
+        return None
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    return body.decode(errors="replace")
+
+
+async def dispatch_sub_request(
+    app: ASGIApp, sub_request: SubRequest, user: AuthenticatedUser, parent_scope: dict
+) -> SubResponse:
+    error = validate_sub_request(sub_request)
+    if error is not None:
+        return error
+
+    body = b"" if sub_request.body is None else json.dumps(sub_request.body).encode()
+    scope = build_scope(sub_request, user, parent_scope, body)
+
+    request_sent = False
+    response_complete = asyncio.Event()
+    response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+    content_type = ""
+    chunks: List[bytes] = []
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message):
+        nonlocal response_status, content_type
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+            for name, value in message.get("headers", []):
+                if name.lower() == b"content-type":
+                    content_type = value.decode()
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    try:
+        # A sub-request never outlives the batch request budget
+        await asyncio.wait_for(app(scope, receive, send), remaining_time())
+    except asyncio.TimeoutError:
+        return SubResponse.model_construct(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            body={"detail": f"Sub-request {sub_request.path} timed out"},
+        )
+    except Exception:
+        # The error middleware already answered 500, keep the other results
+        logger.exception("Error running batch sub-request %s", sub_request.path)
+    finally:
+        response_complete.set()
+
+    try:
+        response_body = parse_body(b"".join(chunks), content_type)
+    except ValueError:
+        response_body = None
+
+    return SubResponse.model_construct(status_code=response_status, body=response_body)
+
+
+async def dispatch_batch(
+    app: ASGIApp,
+    sub_requests: List[SubRequest],
+    user: AuthenticatedUser,
+    parent_scope: dict,
+) -> List[SubResponse]:
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def dispatch(sub_request: SubRequest) -> SubResponse:
+        async with semaphore:
+            return await dispatch_sub_request(app, sub_request, user, parent_scope)
+
+    return await asyncio.gather(
+        *[dispatch(sub_request) for sub_request in sub_requests]
+    )
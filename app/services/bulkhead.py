@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+
+BULKHEAD_MAX_CONCURRENT = int(os.getenv("BULKHEAD_MAX_CONCURRENT", "50"))
+BULKHEAD_MAX_QUEUE = int(os.getenv("BULKHEAD_MAX_QUEUE", "100"))
+BULKHEAD_RETRY_AFTER = int(os.getenv("BULKHEAD_RETRY_AFTER", "1"))
+# Gateway route template -> limits, e.g.
+# {"/chatbot/send_message": {"max_concurrent": 5, "max_queue": 10}}
+ROUTE_BULKHEADS = json.loads(os.getenv("ROUTE_BULKHEADS") or "{}")
+
+
+def upstream_bulkhead_limits(upstream: str) -> dict:
+    # e.g. EXTERNAL_SERVICES_BULKHEAD_MAX_CONCURRENT
+    return {
+        "max_concurrent": int(
+            os.getenv(
+                f"{upstream.upper()}_BULKHEAD_MAX_CONCURRENT", BULKHEAD_MAX_CONCURRENT
+            )
+        ),
+        "max_queue": int(
+            os.getenv(f"{upstream.upper()}_BULKHEAD_MAX_QUEUE", BULKHEAD_MAX_QUEUE)
+        ),
+    }
+
+
+class Bulkhead:
+    """
+    Caps the concurrent upstream calls of an upstream or route. Calls over
+    the limit wait in a bounded queue, once the queue is full they are
+    rejected right away with UPSTREAM_BUSY_ERROR (503 + Retry-After).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int = BULKHEAD_MAX_CONCURRENT,
+        max_queue: int = BULKHEAD_MAX_QUEUE,
+        retry_after: int = BULKHEAD_RETRY_AFTER,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout: Optional[float] = None):
+        if self.semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise APIException(
+                    code=UPSTREAM_BUSY_ERROR,
+                    msg=f"Servicio {self.name} saturado, intente nuevamente",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise APIException(
+                    code=DEADLINE_EXCEEDED_ERROR,
+                    msg=f"Tiempo de espera agotado con el servicio {self.name}",
+                )
+            finally:
+                self.waiting -= 1
+        else:
+            await self.semaphore.acquire()
+
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "max_queue": self.max_queue,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
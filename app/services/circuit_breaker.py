@@ -0,0 +1,141 @@
+import os
+import time
+from collections import deque
+from typing import Callable
+
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+CIRCUIT_BREAKER_SLOW_CALL_RATE = float(
+    os.getenv("CIRCUIT_BREAKER_SLOW_CALL_RATE", "0.8")
+)
+CIRCUIT_BREAKER_SLOW_CALL_DURATION = float(
+    os.getenv("CIRCUIT_BREAKER_SLOW_CALL_DURATION", "5")
+)
+CIRCUIT_BREAKER_WINDOW_SIZE = int(os.getenv("CIRCUIT_BREAKER_WINDOW_SIZE", "20"))
+CIRCUIT_BREAKER_MINIMUM_CALLS = int(os.getenv("CIRCUIT_BREAKER_MINIMUM_CALLS", "10"))
+CIRCUIT_BREAKER_OPEN_DURATION = float(os.getenv("CIRCUIT_BREAKER_OPEN_DURATION", "30"))
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "3"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Count based circuit breaker. It opens when the failure rate or the slow
+    call rate of the last window_size calls crosses its threshold, fails fast
+    while open and, after open_duration, lets half_open_calls probe calls
+    through to decide whether to close again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = CIRCUIT_BREAKER_FAILURE_RATE,
+        slow_call_rate_threshold: float = CIRCUIT_BREAKER_SLOW_CALL_RATE,
+        slow_call_duration: float = CIRCUIT_BREAKER_SLOW_CALL_DURATION,
+        window_size: int = CIRCUIT_BREAKER_WINDOW_SIZE,
+        minimum_calls: int = CIRCUIT_BREAKER_MINIMUM_CALLS,
+        open_duration: float = CIRCUIT_BREAKER_OPEN_DURATION,
+        half_open_calls: int = CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window_size)
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.rejected_calls = 0
+        self.times_opened = 0
+
+    def before_call(self):
+        if self.state == OPEN:
+            if self.clock() - self.opened_at < self.open_duration:
+                self.reject()
+            self.transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_calls:
+                self.reject()
+            self.probes_in_flight += 1
+
+    def reject(self):
+        self.rejected_calls += 1
+        raise APIException(
+            code=UPSTREAM_UNAVAILABLE_ERROR,
+            msg=f"Servicio {self.name} no disponible",
+        )
+
+    def record(self, success: bool, duration: float):
+        slow = duration >= self.slow_call_duration
+
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+            if not success or slow:
+                self.transition(OPEN)
+                return
+            self.probe_successes += 1
+            if self.probe_successes >= self.half_open_calls:
+                self.transition(CLOSED)
+            return
+
+        if self.state != CLOSED:
+            return
+
+        self.outcomes.append((success, slow))
+        if len(self.outcomes) < self.minimum_calls:
+            return
+
+        if (
+            self.failure_rate() >= self.failure_rate_threshold
+            or self.slow_call_rate() >= self.slow_call_rate_threshold
+        ):
+            self.transition(OPEN)
+
+    def release(self):
+        # Call abandoned before an outcome (e.g. cancelled), free its probe slot
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+
+    def transition(self, state: str):
+        self.state = state
+        self.outcomes.clear()
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        if state == OPEN:
+            self.opened_at = self.clock()
+            self.times_opened += 1
+
+    def failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for success, _ in self.outcomes if not success) / len(
+            self.outcomes
+        )
+
+    def slow_call_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, slow in self.outcomes if slow) / len(self.outcomes)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": self.failure_rate(),
+            "slow_call_rate": self.slow_call_rate(),
+            "calls_in_window": len(self.outcomes),
+            "rejected_calls": self.rejected_calls,
+            "times_opened": self.times_opened,
+        }
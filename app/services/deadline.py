@@ -0,0 +1,96 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+from app.utils.request_context import current_scope
+
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))
+# Remaining budget in milliseconds, read from clients and sent to upstreams
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Timeout-Ms")
+
+# Monotonic instant at which the gateway request being served expires
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def parse_timeout_header(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def remaining_time() -> Optional[float]:
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> Optional[float]:
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise APIException(
+            code=DEADLINE_EXCEEDED_ERROR,
+            msg="Tiempo de espera de la solicitud agotado",
+        )
+    return remaining
+
+
+def deadline_headers(remaining: Optional[float]) -> dict:
+    if remaining is None:
+        return {}
+    return {DEADLINE_HEADER: str(int(remaining * 1000))}
+
+
+class DeadlineMiddleware:
+    """
+    Starts the request deadline when the gateway receives a request. Clients
+    may ask for a shorter budget through DEADLINE_HEADER and nested requests
+    (e.g. /batch sub-requests) never outlive the request that started them.
+    """
+
+    def __init__(self, app: ASGIApp, timeout: float = REQUEST_TIMEOUT):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        now = time.monotonic()
+        timeout = self.timeout
+        client_timeout = parse_timeout_header(Headers(scope=scope).get(DEADLINE_HEADER))
+        if client_timeout is not None:
+            timeout = min(timeout, client_timeout)
+
+        deadline = now + timeout
+        parent_deadline = request_deadline.get()
+        if parent_deadline is not None:
+            deadline = min(deadline, parent_deadline)
+
+        if deadline <= now:
+            response = JSONResponse(
+                {"detail": f"{DEADLINE_EXCEEDED_ERROR}: Tiempo de espera agotado"},
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+            await response(scope, receive, send)
+            return
+
+        deadline_token = request_deadline.set(deadline)
+        scope_token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(scope_token)
+            request_deadline.reset(deadline_token)
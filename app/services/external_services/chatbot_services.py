@@ -0,0 +1,55 @@
+import logging
+from contextlib import AsyncExitStack
+from typing import AsyncIterator
+
+import httpx
+
+from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import EXTERNAL_SERVICES, upstream_client
+from app.utils.sse import SSE_MEDIA_TYPE, sse_event
+
+logger = logging.getLogger(__name__)
+
+
+async def relay_assistant_stream(
+    response: httpx.Response, stack: AsyncExitStack
+) -> AsyncIterator[bytes]:
+    # Closing the stack closes the upstream response and frees its bulkhead slot
+    async with stack:
+        try:
+            if response.headers.get("content-type", "").startswith(SSE_MEDIA_TYPE):
+                # Already framed as events by the chatbot service
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+                return
+
+            async for text in response.aiter_text():
+                if text:
+                    yield sse_event(text)
+            yield sse_event("", event="done")
+        except httpx.RequestError:
+            # Headers are already sent, the client learns about it in-band
+            logger.exception("Chatbot stream interrupted")
+            yield sse_event("Error de conexión con el asistente", event="error")
+
+
+async def open_assistant_stream(user_id: int, text: str) -> AsyncIterator[bytes]:
+    # Opened before the response starts so upstream errors keep their status
+    stack = AsyncExitStack()
+    try:
+        response = await stack.enter_async_context(
+            upstream_client.stream(
+                EXTERNAL_SERVICES,
+                "POST",
+                f"/chatbot/send_message/{user_id}/stream",
+                json={"message": text},
+            )
+        )
+        if not response.is_success:
+            await response.aread()
+            handle_response_error(200, response)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    return relay_assistant_stream(response, stack)
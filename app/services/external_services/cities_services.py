@@ -1,4 +1,15 @@
+import bisect
+import json
+import os
+import unicodedata
+from typing import List
+
 from app.schemas.external_services_schemas.cities import Cities, City
+from app.utils.metrics import register_metrics
+
+# Optional JSON dataset with the same city fields the external service returns
+CITIES_INDEX_PATH = os.getenv("CITIES_INDEX_PATH")
+CITIES_INDEX_LIMIT = int(os.getenv("CITIES_INDEX_LIMIT", "10"))
 
 
 def parse_cities(cities_data):
@@ -15,3 +26,93 @@ def parse_cities(cities_data):
         all_cities.append(city_instance)
 
     return Cities(cities=all_cities)
+
+
+def normalize_city_name(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.casefold().split())
+
+
+class CityPrefixIndex:
+    """
+    Sorted array of normalized city names. A prefix lookup is a binary search
+    for the first match followed by a scan over the contiguous matches.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.cities: List[tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def load(self, cities_data: List[dict]):
+        entries = sorted(
+            (
+                normalize_city_name(city["name"]),
+                (
+                    city["name"],
+                    city["country"],
+                    city["state_code"],
+                    float(city["latitude"]),
+                    float(city["longitude"]),
+                ),
+            )
+            for city in cities_data
+        )
+        self.names = [name for name, _ in entries]
+        self.cities = [city for _, city in entries]
+
+    def load_file(self, path: str):
+        with open(path, encoding="utf-8") as dataset:
+            cities_data = json.load(dataset)
+
+        if isinstance(cities_data, dict):
+            cities_data = cities_data["cities"]
+
+        self.load(cities_data)
+
+    def search(self, keyword: str, limit: int = CITIES_INDEX_LIMIT) -> List[City]:
+        prefix = normalize_city_name(keyword)
+
+        matches = []
+        position = bisect.bisect_left(self.names, prefix)
+        while (
+            prefix
+            and position < len(self.names)
+            and len(matches) < limit
+            and self.names[position].startswith(prefix)
+        ):
+            name, country, state_code, latitude, longitude = self.cities[position]
+            matches.append(
+                City.model_construct(
+                    name=name,
+                    country=country,
+                    state_code=state_code,
+                    latitude=latitude,
+                    longitude=longitude,
+                )
+            )
+            position += 1
+
+        if matches:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return matches
+
+    def stats(self) -> dict:
+        return {"size": len(self.names), "hits": self.hits, "misses": self.misses}
+
+
+city_index = CityPrefixIndex()
+register_metrics("city_index", city_index.stats)
+
+
+def load_city_index():
+    if CITIES_INDEX_PATH:
+        city_index.load_file(CITIES_INDEX_PATH)
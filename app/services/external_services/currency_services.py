@@ -0,0 +1,32 @@
+import os
+
+from app.schemas.external_services_schemas.currency import Currency
+from app.utils.metrics import register_metrics
+from app.utils.ttl_cache import TTLCache
+
+CURRENCY_RATE_TTL = float(os.getenv("CURRENCY_RATE_TTL", "600"))
+CURRENCY_CACHE_MAX_SIZE = int(os.getenv("CURRENCY_CACHE_MAX_SIZE", "1000"))
+
+currency_rate_cache = TTLCache(max_size=CURRENCY_CACHE_MAX_SIZE)
+register_metrics("currency_rate_cache", currency_rate_cache.stats)
+
+
+def currency_pair_key(currency: str, interest_currency: str) -> tuple:
+    return (currency.strip().upper(), interest_currency.strip().upper())
+
+
+def parse_currency_rate(currency_data: dict) -> dict:
+    # The rate is the conversion of one unit of the base currency
+    return {
+        "base_code": currency_data["base_code"],
+        "target_code": currency_data["target_code"],
+        "rate": currency_data["conversion"],
+    }
+
+
+def convert_currency(currency_rate: dict, amount: float) -> Currency:
+    return Currency.model_construct(
+        base_code=currency_rate["base_code"],
+        target_code=currency_rate["target_code"],
+        conversion=currency_rate["rate"] * amount,
+    )
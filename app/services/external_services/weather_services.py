@@ -1,10 +1,37 @@
+import os
+import time
 from datetime import date, datetime
+from typing import Optional
 
 from app.schemas.external_services_schemas.weather import (
     DayWeather,
     FiveDayWeather,
     Weather,
 )
+from app.utils.metrics import register_metrics
+from app.utils.ttl_cache import TTLCache
+
+WEATHER_CACHE_MAX_SIZE = int(os.getenv("WEATHER_CACHE_MAX_SIZE", "1000"))
+# Seconds between forecast updates of the weather provider, aligned to UTC
+WEATHER_FORECAST_INTERVAL = float(os.getenv("WEATHER_FORECAST_INTERVAL", "10800"))
+
+weather_cache = TTLCache(max_size=WEATHER_CACHE_MAX_SIZE)
+register_metrics("weather_cache", weather_cache.stats)
+
+
+def weather_cache_key(
+    city: str, province: Optional[str] = None, country: Optional[str] = None
+) -> tuple:
+    return tuple(
+        " ".join((value or "").split()).casefold()
+        for value in (city, province, country)
+    )
+
+
+def seconds_until_next_forecast(now: Optional[float] = None) -> float:
+    if now is None:
+        now = time.time()
+    return WEATHER_FORECAST_INTERVAL - (now % WEATHER_FORECAST_INTERVAL)
 
 
 def parse_weather_days(weather_data: dict):
@@ -0,0 +1,128 @@
+import asyncio
+import math
+import os
+import time
+from collections import defaultdict, deque
+from typing import Awaitable, Callable
+
+import httpx
+
+from app.services.retry_policy import RetryBudget
+from app.utils.request_context import route_template
+
+# Extra requests allowed as a fraction of hedged traffic
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_WINDOW_SIZE = int(os.getenv("HEDGE_WINDOW_SIZE", "200"))
+# Below this many samples the route p95 is not trusted and nothing is hedged
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.01"))
+
+
+class LatencyTracker:
+    """
+    Latencies of the last window_size calls of a route
+    """
+
+    def __init__(self, window_size: int = HEDGE_WINDOW_SIZE):
+        self.latencies = deque(maxlen=window_size)
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+
+    def quantile(self, quantile: float) -> float:
+        latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1, math.ceil(quantile * len(latencies)) - 1)
+        return latencies[max(index, 0)]
+
+
+class HedgingPolicy:
+    """
+    Sends a second identical request when the first one has not answered
+    within the route's observed p95, keeps whichever succeeds first and
+    cancels the other. Hedges are paid from a budget shared by every route.
+    """
+
+    def __init__(
+        self,
+        budget: RetryBudget,
+        quantile: float = HEDGE_QUANTILE,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        min_delay: float = HEDGE_MIN_DELAY,
+        window_size: int = HEDGE_WINDOW_SIZE,
+    ):
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.trackers = defaultdict(lambda: LatencyTracker(window_size))
+        self.hedged = defaultdict(int)
+        self.hedges_won = defaultdict(int)
+
+    def hedge_delay(self, route: str):
+        tracker = self.trackers[route]
+        if len(tracker.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.quantile(self.quantile))
+
+    async def run(
+        self, send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        route = route_template() or "background"
+        self.budget.deposit()
+
+        start = time.monotonic()
+        first = asyncio.ensure_future(send())
+        tasks = [first]
+        try:
+            delay = self.hedge_delay(route)
+            if delay is not None:
+                await asyncio.wait([first], timeout=delay)
+
+            if first.done() or delay is None or not self.budget.withdraw():
+                response = await first
+            else:
+                self.hedged[route] += 1
+                tasks.append(asyncio.ensure_future(send()))
+                response, winner = await self.first_success(tasks)
+                if winner is not first:
+                    self.hedges_won[route] += 1
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    # Retrieve the loser's exception so it is never unhandled
+                    task.exception()
+
+        self.trackers[route].record(time.monotonic() - start)
+        return response
+
+    async def first_success(self, tasks: list):
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in tasks:
+                if task not in done:
+                    continue
+                if task.exception() is None:
+                    return task.result(), task
+                error = error or task.exception()
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "budget": self.budget.stats(),
+            "routes": {
+                route: {
+                    "hedge_delay": self.hedge_delay(route),
+                    "hedged": self.hedged[route],
+                    "hedges_won": self.hedges_won[route],
+                }
+                for route in self.trackers
+            },
+        }
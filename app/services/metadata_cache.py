@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+from app.services.handle_error_service import handle_response_error
+from app.services.upstream_client import ATTRACTIONS, upstream_client
+from app.utils.metrics import register_metrics
+
+METADATA_REFRESH_INTERVAL = float(os.getenv("METADATA_REFRESH_INTERVAL", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+def build_etag(payload: bytes) -> str:
+    return f'"{hashlib.sha256(payload).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [
+        tag[2:] if tag.startswith("W/") else tag for tag in candidates
+    ]
+
+
+class MetadataCache:
+    """
+    Keeps the last application metadata payload fetched from the attractions
+    service. The payload is refreshed in the background every refresh_interval
+    seconds and the stale copy keeps being served while a refresh is running
+    or after it fails.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.payload: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.fetched_at: Optional[float] = None
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.refresh_loop_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def is_stale(self) -> bool:
+        return (
+            self.fetched_at is None
+            or time.monotonic() - self.fetched_at >= self.refresh_interval
+        )
+
+    async def refresh(self):
+        response = await upstream_client.get(ATTRACTIONS, "/metadata")
+
+        handle_response_error(200, response)
+
+        self.payload = response.content
+        self.etag = build_etag(self.payload)
+        self.fetched_at = time.monotonic()
+        self.refreshes += 1
+
+    async def refresh_quietly(self):
+        try:
+            await self.refresh()
+        except Exception:
+            self.refresh_errors += 1
+            logger.exception("Metadata refresh failed, serving stale copy")
+
+    def refresh_in_background(self):
+        if self.refresh_task is None or self.refresh_task.done():
+            # Run outside the request context so its deadline does not apply
+            self.refresh_task = contextvars.Context().run(
+                asyncio.create_task, self.refresh_quietly()
+            )
+
+    async def get(self) -> Tuple[bytes, str]:
+        if self.payload is None:
+            await self.refresh()
+        elif self.is_stale():
+            self.refresh_in_background()
+
+        return self.payload, self.etag
+
+    async def refresh_loop(self):
+        while True:
+            await self.refresh_quietly()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self.refresh_loop_task is None:
+            self.refresh_loop_task = asyncio.create_task(self.refresh_loop())
+
+    async def stop(self):
+        tasks = [self.refresh_loop_task, self.refresh_task]
+        self.refresh_loop_task = self.refresh_task = None
+        for task in tasks:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "etag": self.etag,
+            "age": (
+                None if self.fetched_at is None else time.monotonic() - self.fetched_at
+            ),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+metadata_cache = MetadataCache(refresh_interval=METADATA_REFRESH_INTERVAL)
+register_metrics("metadata_cache", metadata_cache.stats)
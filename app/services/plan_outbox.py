@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.services.plan_publisher import PlanPublisher, plan_publisher
+from app.utils.metrics import register_metrics
+
+# Keep it on a persistent volume, entries only survive as long as the file
+PLAN_OUTBOX_PATH = os.getenv("PLAN_OUTBOX_PATH", "plan_outbox.sqlite3")
+PLAN_OUTBOX_DRAIN_BATCH = int(os.getenv("PLAN_OUTBOX_DRAIN_BATCH", "50"))
+PLAN_OUTBOX_POLL_INTERVAL = float(os.getenv("PLAN_OUTBOX_POLL_INTERVAL", "1"))
+PLAN_OUTBOX_RETRY_BASE_DELAY = float(os.getenv("PLAN_OUTBOX_RETRY_BASE_DELAY", "1"))
+PLAN_OUTBOX_RETRY_MAX_DELAY = float(os.getenv("PLAN_OUTBOX_RETRY_MAX_DELAY", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class PlanOutbox:
+    """
+    SQLite outbox for plan messages. queue_plan only waits for the local
+    commit, a background drainer forwards entries to SQS through the batch
+    publisher and keeps failed ones with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        path: str = PLAN_OUTBOX_PATH,
+        publisher: PlanPublisher = plan_publisher,
+        drain_batch: int = PLAN_OUTBOX_DRAIN_BATCH,
+        poll_interval: float = PLAN_OUTBOX_POLL_INTERVAL,
+        retry_base_delay: float = PLAN_OUTBOX_RETRY_BASE_DELAY,
+        retry_max_delay: float = PLAN_OUTBOX_RETRY_MAX_DELAY,
+    ):
+        self.path = path
+        self.publisher = publisher
+        self.drain_batch = drain_batch
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.connection: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stopping = False
+        self.depth = 0
+        self.sent = 0
+        self.retries = 0
+
+    def open(self):
+        with self.lock:
+            if self.connection is not None:
+                return
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=FULL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "message TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL DEFAULT 0)"
+            )
+            self.connection.commit()
+            (self.depth,) = self.connection.execute(
+                "SELECT COUNT(*) FROM outbox"
+            ).fetchone()
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def insert(self, message: dict) -> int:
+        self.open()
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO outbox (message, created_at) VALUES (?, ?)",
+                (json.dumps(message), time.time()),
+            )
+            self.connection.commit()
+            self.depth += 1
+            return cursor.lastrowid
+
+    def due(self, limit: int) -> List[Tuple[int, int, dict]]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, attempts, message FROM outbox "
+                "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [(id, attempts, json.loads(message)) for id, attempts, message in rows]
+
+    def delete(self, ids: List[int]):
+        with self.lock:
+            self.connection.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(id,) for id in ids]
+            )
+            self.connection.commit()
+            self.depth -= len(ids)
+
+    def reschedule(self, entries: List[Tuple[int, int]]):
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?",
+                [
+                    (attempts + 1, now + self.retry_delay(attempts), id)
+                    for id, attempts in entries
+                ],
+            )
+            self.connection.commit()
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.retry_max_delay, self.retry_base_delay * 2**attempts)
+
+    async def add(self, message: dict):
+        # Returns once the message is committed to disk
+        await asyncio.to_thread(self.insert, message)
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def drain(self) -> int:
+        entries = await asyncio.to_thread(self.due, self.drain_batch)
+        if not entries:
+            return 0
+
+        results = await asyncio.gather(
+            *[self.publisher.publish(message) for _, _, message in entries],
+            return_exceptions=True,
+        )
+        sent = [id for (id, _, _), result in zip(entries, results) if result is None]
+        failed = [
+            (id, attempts)
+            for (id, attempts, _), result in zip(entries, results)
+            if result is not None
+        ]
+
+        # A crash between publishing and deleting resends the entry, SQS
+        # FIFO deduplication absorbs it
+        if sent:
+            await asyncio.to_thread(self.delete, sent)
+            self.sent += len(sent)
+        if failed:
+            logger.warning("%s plan messages kept in the outbox for retry", len(failed))
+            await asyncio.to_thread(self.reschedule, failed)
+            self.retries += len(failed)
+        return len(entries)
+
+    async def run(self):
+        while not self.stopping:
+            try:
+                drained = await self.drain()
+            except Exception:
+                logger.exception("Error draining the plan outbox")
+                drained = 0
+
+            if drained < self.drain_batch and not self.stopping:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def start(self):
+        await asyncio.to_thread(self.open)
+        if self.task is None:
+            self.stopping = False
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            # Let the batch being drained finish, cancelling it would leave
+            # rows for messages the publisher still sends
+            task, self.task = self.task, None
+            self.stopping = True
+            self.wakeup.set()
+            await task
+        # Pending entries stay on disk for the next start
+        await asyncio.to_thread(self.close)
+
+    def stats(self) -> dict:
+        return {"depth": self.depth, "sent": self.sent, "retries": self.retries}
+
+
+plan_outbox = PlanOutbox()
+register_metrics("plan_outbox", plan_outbox.stats)
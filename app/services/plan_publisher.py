@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import urllib.parse
+from typing import Callable, List, Optional, Tuple
+
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+from app.utils.metrics import register_metrics
+
+AWS_REGION = os.getenv("AWS_REGION", "us-east-2")
+QUEUE_URL = os.getenv("QUEUE_URL")
+QUEUE_MESSAGE_GROUP_ID = "planner"
+# Fields that identify a plan request, repeats of them are the same job
+PLAN_DEDUPLICATION_FIELDS = (
+    "user_id",
+    "plan_name",
+    "destination",
+    "init_date",
+    "end_date",
+)
+
+# SendMessageBatch accepts at most 10 entries
+SQS_BATCH_SIZE = min(int(os.getenv("SQS_BATCH_SIZE", "10")), 10)
+SQS_BATCH_LINGER = float(os.getenv("SQS_BATCH_LINGER", "0.05"))
+SQS_BUFFER_MAX_SIZE = int(os.getenv("SQS_BUFFER_MAX_SIZE", "1000"))
+SQS_PUBLISH_CONCURRENCY = int(os.getenv("SQS_PUBLISH_CONCURRENCY", "4"))
+
+logger = logging.getLogger(__name__)
+
+sqs_client = None
+
+
+def get_sqs_client():
+    # Built on first publish instead of at import time
+    global sqs_client
+    if sqs_client is None:
+        import boto3
+
+        sqs_client = boto3.client(
+            "sqs",
+            region_name=AWS_REGION,
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=urllib.parse.quote_plus(
+                os.getenv("AWS_SECRET_ACCESS_KEY", ""), safe="/"
+            ),
+        )
+    return sqs_client
+
+
+def plan_deduplication_id(message: dict) -> str:
+    fields = [message[field] for field in PLAN_DEDUPLICATION_FIELDS]
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+
+def send_message_batch(messages: List[dict]) -> dict:
+    # Blocking boto3 call, always run in a worker thread
+    return get_sqs_client().send_message_batch(
+        QueueUrl=QUEUE_URL,
+        Entries=[
+            {
+                "Id": str(index),
+                "MessageBody": json.dumps(message),
+                "MessageGroupId": QUEUE_MESSAGE_GROUP_ID,
+                "MessageDeduplicationId": plan_deduplication_id(message),
+            }
+            for index, message in enumerate(messages)
+        ],
+    )
+
+
+def queue_error(msg: str) -> APIException:
+    return APIException(code=PLAN_QUEUE_ERROR, msg=msg)
+
+
+class PlanPublisher:
+    """
+    Buffers plan messages and publishes them with SendMessageBatch, once a
+    batch is full or after a short linger. publish() returns when SQS has
+    acknowledged the message, without holding a thread while it waits.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[dict]], dict] = send_message_batch,
+        batch_size: int = SQS_BATCH_SIZE,
+        linger: float = SQS_BATCH_LINGER,
+        max_buffer: int = SQS_BUFFER_MAX_SIZE,
+        concurrency: int = SQS_PUBLISH_CONCURRENCY,
+    ):
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_buffer = max_buffer
+        self.concurrency = concurrency
+        self.buffer: Optional[asyncio.Queue] = None
+        self.flush_slots: Optional[asyncio.Semaphore] = None
+        self.task: Optional[asyncio.Task] = None
+        # Taken from the buffer but not handed to a flush yet
+        self.collecting: List[Tuple[dict, asyncio.Future]] = []
+        self.flushes = set()
+        self.batches_sent = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+
+    def start(self):
+        if self.task is None:
+            self.buffer = asyncio.Queue(maxsize=self.max_buffer)
+            self.flush_slots = asyncio.Semaphore(self.concurrency)
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        task, self.task = self.task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        # Publish whatever is still buffered before shutting down
+        pending, self.collecting = self.collecting, []
+        while not self.buffer.empty():
+            pending.append(self.buffer.get_nowait())
+        for start in range(0, len(pending), self.batch_size):
+            await self.flush(pending[start : start + self.batch_size])
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
+
+    async def publish(self, message: dict):
+        if self.task is None:
+            # Outside the app lifespan (scripts), publish right away
+            future = asyncio.get_running_loop().create_future()
+            await self.flush([(message, future)])
+            await future
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.buffer.put_nowait((message, future))
+        except asyncio.QueueFull:
+            raise queue_error("Cola de planes saturada, intente nuevamente")
+        await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self.collecting = [await self.buffer.get()]
+            linger_until = loop.time() + self.linger
+            while len(batch) < self.batch_size:
+                timeout = linger_until - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.buffer.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self.flush_slots.acquire()
+            self.collecting = []
+            flush = asyncio.create_task(self.flush(batch))
+            self.flushes.add(flush)
+            flush.add_done_callback(self.flush_done)
+
+    def flush_done(self, flush: asyncio.Task):
+        self.flushes.discard(flush)
+        self.flush_slots.release()
+
+    async def flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        # A cancelled caller (e.g. an outbox drain) keeps its message for a
+        # later resend, publishing it too would send it twice
+        batch = [(message, future) for message, future in batch if not future.done()]
+        if not batch:
+            return
+
+        messages = [message for message, _ in batch]
+        try:
+            response = await asyncio.to_thread(self.send_batch, messages)
+        except Exception:
+            logger.exception("Error publishing %s plan messages", len(batch))
+            self.messages_failed += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(
+                        queue_error("Error encolando el plan, intente nuevamente")
+                    )
+            return
+
+        self.batches_sent += 1
+        failed = {entry["Id"] for entry in response.get("Failed", [])}
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if str(index) in failed:
+                self.messages_failed += 1
+                future.set_exception(
+                    queue_error("Error encolando el plan, intente nuevamente")
+                )
+            else:
+                self.messages_sent += 1
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self.buffer.qsize() if self.buffer is not None else 0,
+            "publishing": len(self.flushes),
+            "batches_sent": self.batches_sent,
+            "messages_sent": self.messages_sent,
+            "messages_failed": self.messages_failed,
+        }
+
+
+plan_publisher = PlanPublisher()
+register_metrics("plan_publisher", plan_publisher.stats)
@@ -0,0 +1,246 @@
+import asyncio
+import base64
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+from typing import AsyncIterator, Dict, Optional, Set
+
+from app.services.upstream_client import PLANNER, upstream_client
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+from app.utils.metrics import register_metrics
+from app.utils.sse import SSE_KEEPALIVE, sse_event
+from app.utils.ttl_cache import TTLCache
+
+PLAN_WATCH_INTERVAL = float(os.getenv("PLAN_WATCH_INTERVAL", "5"))
+PLAN_WATCH_TIMEOUT = float(os.getenv("PLAN_WATCH_TIMEOUT", "600"))
+# Finished watches stay around for clients that subscribe late
+PLAN_WATCH_RESULT_TTL = float(os.getenv("PLAN_WATCH_RESULT_TTL", "300"))
+PLAN_EVENTS_KEEPALIVE = float(os.getenv("PLAN_EVENTS_KEEPALIVE", "15"))
+# Signs plan request ids, every replica must share it for any of them to
+# accept an id another one issued
+PLAN_REQUEST_SECRET = os.getenv(
+    "PLAN_REQUEST_SECRET", ""
+).encode() or secrets.token_bytes(32)
+PLAN_MESSAGE_FIELDS = ("user_id", "plan_name", "destination", "init_date", "end_date")
+
+logger = logging.getLogger(__name__)
+
+
+def sign(payload: str) -> str:
+    digest = hmac.new(PLAN_REQUEST_SECRET, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def encode_plan_request_id(message: dict) -> str:
+    # Carries the plan message itself, so any replica can rebuild the watch
+    fields = [message[field] for field in PLAN_MESSAGE_FIELDS]
+    payload = base64.urlsafe_b64encode(json.dumps(fields).encode()).rstrip(b"=")
+    payload = payload.decode()
+    return f"{payload}.{sign(payload)}"
+
+
+def decode_plan_request_id(plan_request_id: str) -> Optional[dict]:
+    payload, _, signature = plan_request_id.partition(".")
+    if not hmac.compare_digest(signature.encode(), sign(payload).encode()):
+        return None
+    try:
+        padded = payload + "=" * (-len(payload) % 4)
+        fields = json.loads(base64.urlsafe_b64decode(padded))
+        return dict(zip(PLAN_MESSAGE_FIELDS, fields, strict=True))
+    except (TypeError, ValueError):
+        return None
+
+
+def plan_identity(plan: dict) -> str:
+    return str(plan.get("id") or plan.get("_id") or json.dumps(plan, sort_keys=True))
+
+
+def plan_identities(plans) -> Set[str]:
+    return {
+        plan_identity(plan)
+        for plan in (plans if isinstance(plans, list) else [])
+        if isinstance(plan, dict)
+    }
+
+
+def find_plan(plans, message: dict, known: Set[str]) -> Optional[dict]:
+    # The planner lists every plan of the user, the queued one is matched by
+    # its name and, when the planner returns it, its destination. Plans the
+    # user already had when the watch first polled are skipped.
+    if not isinstance(plans, list):
+        return None
+    for plan in plans:
+        if not isinstance(plan, dict) or plan.get("plan_name") != message["plan_name"]:
+            continue
+        if plan.get("destination", message["destination"]) != message["destination"]:
+            continue
+        if plan_identity(plan) in known:
+            continue
+        return plan
+    return None
+
+
+class PlanWatch:
+    def __init__(self, plan_request_id: str, message: dict):
+        self.plan_request_id = plan_request_id
+        self.message = message
+        # Plans listed on the first poll, None until it happens
+        self.known: Optional[Set[str]] = None
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self.expiry: Optional[asyncio.TimerHandle] = None
+
+
+class PlanWatcher:
+    """
+    Watches queued plans until the planner lists them, one watch per plan
+    request however many clients are subscribed. The planner is only polled
+    while at least one client is subscribed, and watches of the same user
+    poll the same planner URL, so concurrent polls are coalesced too.
+    """
+
+    def __init__(
+        self,
+        interval: float = PLAN_WATCH_INTERVAL,
+        timeout: float = PLAN_WATCH_TIMEOUT,
+        result_ttl: float = PLAN_WATCH_RESULT_TTL,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.watches: Dict[str, PlanWatch] = {}
+        self.finished = TTLCache(max_size=10000)
+        self.polls = 0
+        self.plans_ready = 0
+        self.timeouts = 0
+
+    def watch(self, plan_request_id: str, message: dict):
+        if plan_request_id in self.watches:
+            return
+        if self.finished.get(plan_request_id) is not None:
+            return
+
+        watch = PlanWatch(plan_request_id, message)
+        self.watches[plan_request_id] = watch
+        watch.expiry = asyncio.get_running_loop().call_later(
+            self.timeout, self.finish, watch, None
+        )
+
+    def get(self, plan_request_id: str, user_id: int) -> PlanWatch:
+        watch = self.watches.get(plan_request_id) or self.finished.get(plan_request_id)
+        if watch is None:
+            # Queued by another replica or before a restart
+            message = decode_plan_request_id(plan_request_id)
+            if message is not None and message["user_id"] == user_id:
+                self.watch(plan_request_id, message)
+                watch = self.watches[plan_request_id]
+        if watch is None or watch.message["user_id"] != user_id:
+            raise APIException(
+                code=PLAN_NOT_FOUND_ERROR, msg="No hay un plan en curso con ese id"
+            )
+        return watch
+
+    def subscribe(self, watch: PlanWatch):
+        watch.subscribers += 1
+        if watch.task is None and not watch.result.done():
+            # Run outside the request context so its deadline does not apply
+            watch.task = contextvars.Context().run(asyncio.create_task, self.run(watch))
+
+    def unsubscribe(self, watch: PlanWatch):
+        watch.subscribers -= 1
+        # Nobody is listening, stop reading the planner until someone is
+        if watch.subscribers == 0 and watch.task is not None:
+            watch.task.cancel()
+            watch.task = None
+
+    async def poll(self, watch: PlanWatch) -> Optional[dict]:
+        self.polls += 1
+        response = await upstream_client.get(
+            PLANNER, f"/plan/user/{watch.message['user_id']}"
+        )
+        if response.status_code != 200:
+            return None
+
+        plans = response.json()
+        if watch.known is None:
+            # Taken once a client subscribes, never on the POST /plan path
+            watch.known = plan_identities(plans)
+            return None
+        return find_plan(plans, watch.message, watch.known)
+
+    async def run(self, watch: PlanWatch):
+        while not watch.result.done():
+            try:
+                plan = await self.poll(watch)
+            except Exception:
+                logger.exception("Error checking plan %s", watch.plan_request_id)
+                plan = None
+            if plan is not None:
+                self.finish(watch, plan)
+                return
+            await asyncio.sleep(self.interval)
+
+    def finish(self, watch: PlanWatch, plan: Optional[dict]):
+        if watch.result.done():
+            return
+        if plan is not None:
+            self.plans_ready += 1
+        else:
+            self.timeouts += 1
+        watch.result.set_result(plan)
+        watch.expiry.cancel()
+        self.watches.pop(watch.plan_request_id, None)
+        self.finished.set(watch.plan_request_id, watch, self.result_ttl)
+
+    async def events(
+        self, watch: PlanWatch, keepalive: float = PLAN_EVENTS_KEEPALIVE
+    ) -> AsyncIterator[bytes]:
+        self.subscribe(watch)
+        try:
+            while True:
+                try:
+                    plan = await asyncio.wait_for(
+                        asyncio.shield(watch.result), keepalive
+                    )
+                    break
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield SSE_KEEPALIVE
+        finally:
+            self.unsubscribe(watch)
+
+        if plan is None:
+            yield sse_event("", event="timeout")
+        else:
+            yield sse_event(json.dumps(plan), event="plan_ready")
+
+    async def stop(self):
+        watches, self.watches = list(self.watches.values()), {}
+        tasks = [watch.task for watch in watches if watch.task is not None]
+        for watch in watches:
+            watch.expiry.cancel()
+            if watch.task is not None:
+                watch.task.cancel()
+            # Subscribers still connected get a timeout event
+            if not watch.result.done():
+                watch.result.set_result(None)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "watching": len(self.watches),
+            "polling": sum(watch.task is not None for watch in self.watches.values()),
+            "polls": self.polls,
+            "plans_ready": self.plans_ready,
+            "timeouts": self.timeouts,
+        }
+
+
+plan_watcher = PlanWatcher()
+register_metrics("plan_watcher", plan_watcher.stats)
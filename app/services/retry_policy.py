@@ -0,0 +1,149 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+import httpx
+
+from app.services.deadline import remaining_time
+from app.utils.request_context import route_template
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.05"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "1"))
+# Retries allowed as a fraction of live requests, plus a small floor so low
+# traffic periods can still retry
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+# Caps what quiet periods can save up for a burst of retries
+RETRY_BUDGET_MAX_BALANCE = float(os.getenv("RETRY_BUDGET_MAX_BALANCE", "10"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Token bucket shared by every upstream call. Each request deposits ratio
+    tokens, each retry withdraws a whole one, so retries stay a bounded share
+    of traffic and stop almost entirely when every call is failing.
+    """
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+        max_balance: float = RETRY_BUDGET_MAX_BALANCE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.clock = clock
+        self.balance = 0.0
+        self.reserve = self.min_per_second
+        self.refilled_at = clock()
+
+    def refill_reserve(self):
+        now = self.clock()
+        self.reserve = min(
+            self.min_per_second,
+            self.reserve + (now - self.refilled_at) * self.min_per_second,
+        )
+        self.refilled_at = now
+
+    def deposit(self):
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        self.refill_reserve()
+        if self.reserve >= 1:
+            self.reserve -= 1
+            return True
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {"balance": self.balance, "reserve": self.reserve}
+
+
+class RetryPolicy:
+    """
+    Retries idempotent upstream calls on transport errors and 502/503/504
+    responses, with full jitter exponential backoff. A retry only happens if
+    the budget allows it and the backoff fits in the request deadline.
+    Timeouts and open breakers reach here as APIException and are not retried.
+    """
+
+    def __init__(
+        self,
+        budget: RetryBudget,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.retries = defaultdict(int)
+        self.budget_exhausted = defaultdict(int)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def should_retry(self, attempt: int, delay: float, route: str) -> bool:
+        if attempt + 1 >= self.max_attempts:
+            return False
+
+        remaining = remaining_time()
+        if remaining is not None and remaining <= delay:
+            return False
+
+        if not self.budget.withdraw():
+            self.budget_exhausted[route] += 1
+            return False
+
+        self.retries[route] += 1
+        return True
+
+    async def run(
+        self, send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        route = route_template() or "background"
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            delay = self.backoff(attempt)
+            try:
+                response = await send()
+            except httpx.TransportError:
+                if not self.should_retry(attempt, delay, route):
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if not self.should_retry(attempt, delay, route):
+                    return response
+
+            attempt += 1
+            await self.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "budget": self.budget.stats(),
+            "routes": {
+                route: {
+                    "retries": self.retries[route],
+                    "budget_exhausted": self.budget_exhausted[route],
+                }
+                for route in set(self.retries) | set(self.budget_exhausted)
+            },
+        }
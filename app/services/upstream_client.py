@@ -0,0 +1,349 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.services.bulkhead import ROUTE_BULKHEADS, Bulkhead, upstream_bulkhead_limits
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.deadline import (
+    check_deadline,
+    deadline_headers,
+    remaining_time,
+    request_deadline,
+)
+from app.services.hedging import HEDGE_BUDGET_RATIO, HedgingPolicy
+from app.services.retry_policy import IDEMPOTENT_METHODS, RetryBudget, RetryPolicy
+from app.services.singleflight import SingleFlight
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+from app.utils.metrics import register_metrics
+from app.utils.request_context import route_template
+
+ATTRACTIONS = "attractions"
+AUTHENTICATION = "authentication"
+EXTERNAL_SERVICES = "external_services"
+PLANNER = "planner"
+NOTIFICATIONS = "notifications"
+
+UPSTREAM_URLS = {
+    ATTRACTIONS: os.getenv("ATTRACTIONS_URL"),
+    AUTHENTICATION: os.getenv("AUTHENTICATION_URL"),
+    EXTERNAL_SERVICES: os.getenv("EXTERNAL_SERVICES_URL"),
+    PLANNER: os.getenv("PLANNER_URL"),
+    NOTIFICATIONS: os.getenv("NOTIFICATIONS_URL"),
+}
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30"))
+# e.g. ATTRACTIONS_CONNECT_TIMEOUT, EXTERNAL_SERVICES_READ_TIMEOUT
+UPSTREAM_TIMEOUTS = {
+    upstream: {
+        "connect": float(
+            os.getenv(f"{upstream.upper()}_CONNECT_TIMEOUT", UPSTREAM_CONNECT_TIMEOUT)
+        ),
+        "read": float(
+            os.getenv(f"{upstream.upper()}_READ_TIMEOUT", UPSTREAM_READ_TIMEOUT)
+        ),
+    }
+    for upstream in UPSTREAM_URLS
+}
+# Gateway route template -> timeouts, e.g. {"/chatbot/send_message": {"read": 60}}
+UPSTREAM_ROUTE_TIMEOUTS = json.loads(os.getenv("UPSTREAM_ROUTE_TIMEOUTS") or "{}")
+
+
+def drop_none_params(kwargs: dict):
+    # requests skipped None query params, httpx would send them as "key="
+    params = kwargs.get("params")
+    if isinstance(params, dict):
+        kwargs["params"] = {
+            key: value for key, value in params.items() if value is not None
+        }
+
+
+class UpstreamClient:
+    """
+    Gateway-wide async HTTP client. Keeps one connection pool per upstream
+    service so calls reuse keep-alive connections instead of opening a new
+    one per request.
+    """
+
+    def __init__(
+        self,
+        base_urls: Dict[str, Optional[str]],
+        timeouts: Optional[Dict[str, dict]] = None,
+        route_timeouts: Optional[Dict[str, dict]] = None,
+        route_bulkheads: Optional[Dict[str, dict]] = None,
+    ):
+        self.base_urls = base_urls
+        self.timeouts = UPSTREAM_TIMEOUTS if timeouts is None else timeouts
+        self.route_timeouts = (
+            UPSTREAM_ROUTE_TIMEOUTS if route_timeouts is None else route_timeouts
+        )
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.singleflight = SingleFlight()
+        self.breakers = {upstream: CircuitBreaker(upstream) for upstream in base_urls}
+        self.bulkheads = {
+            upstream: Bulkhead(upstream, **upstream_bulkhead_limits(upstream))
+            for upstream in base_urls
+        }
+        self.route_bulkheads = {
+            route: Bulkhead(route, **limits)
+            for route, limits in (
+                ROUTE_BULKHEADS if route_bulkheads is None else route_bulkheads
+            ).items()
+        }
+        self.retry_policy = RetryPolicy(RetryBudget())
+        self.hedging_policy = HedgingPolicy(
+            RetryBudget(ratio=HEDGE_BUDGET_RATIO, min_per_second=0)
+        )
+
+    def _build_client(self, upstream: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_urls.get(upstream) or "",
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=None,
+            # Same as the requests based calls this client replaced
+            follow_redirects=True,
+        )
+
+    async def start(self):
+        for upstream in self.base_urls:
+            if upstream not in self.clients:
+                self.clients[upstream] = self._build_client(upstream)
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def client(self, upstream: str) -> httpx.AsyncClient:
+        if upstream not in self.base_urls:
+            raise KeyError(f"Unknown upstream: {upstream}")
+
+        # Pools are created on startup, this only covers callers running
+        # outside the app lifespan (scripts, tests)
+        if upstream not in self.clients:
+            self.clients[upstream] = self._build_client(upstream)
+
+        return self.clients[upstream]
+
+    async def request(
+        self,
+        upstream: str,
+        method: str,
+        path: str,
+        coalesce: bool = True,
+        idempotent: Optional[bool] = None,
+        hedge: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        drop_none_params(kwargs)
+        # PUT/DELETE calls opt in with idempotent=True where a repeat is harmless
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        def attempt() -> Awaitable[httpx.Response]:
+            return self._send(upstream, method, path, **kwargs)
+
+        def retried() -> Awaitable[httpx.Response]:
+            return self.retry_policy.run(attempt)
+
+        def send() -> Awaitable[httpx.Response]:
+            if not idempotent:
+                return attempt()
+            # Hedging duplicates the call, so it only applies to idempotent reads
+            if hedge:
+                return self.hedging_policy.run(retried)
+            return retried()
+
+        key = self._coalescing_key(upstream, method, path, kwargs)
+        if coalesce and key is not None:
+            return await self._coalesced(upstream, key, send)
+
+        return await send()
+
+    async def _coalesced(
+        self, upstream: str, key: tuple, send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        def shared() -> Awaitable[httpx.Response]:
+            # The shared call must not inherit the deadline of whoever started
+            # it, a caller with a tiny budget would fail it for everyone
+            context = contextvars.copy_context()
+            context.run(request_deadline.set, None)
+            return context.run(asyncio.ensure_future, send())
+
+        # Each caller only waits for as long as its own budget allows
+        remaining = check_deadline()
+        try:
+            return await asyncio.wait_for(self.singleflight.do(key, shared), remaining)
+        except asyncio.TimeoutError:
+            raise APIException(
+                code=DEADLINE_EXCEEDED_ERROR,
+                msg=f"Tiempo de espera agotado con el servicio {upstream}",
+            )
+
+    @asynccontextmanager
+    async def _bulkheads(self, upstream: str):
+        bulkheads = [
+            self.route_bulkheads.get(route_template()),
+            self.bulkheads[upstream],
+        ]
+        acquired = []
+        try:
+            for bulkhead in bulkheads:
+                if bulkhead is not None:
+                    # Never queue for longer than the request budget
+                    await bulkhead.acquire(remaining_time())
+                    acquired.append(bulkhead)
+            yield
+        finally:
+            for bulkhead in reversed(acquired):
+                bulkhead.release()
+
+    async def _send(
+        self, upstream: str, method: str, path: str, **kwargs
+    ) -> httpx.Response:
+        client = self.client(upstream)
+        check_deadline()
+        async with self._bulkheads(upstream):
+            return await self._call(client, upstream, method, path, **kwargs)
+
+    @asynccontextmanager
+    async def stream(
+        self, upstream: str, method: str, path: str, **kwargs
+    ) -> AsyncIterator[httpx.Response]:
+        # Never retried nor coalesced, the bulkhead slot is held until the
+        # body has been consumed and the response closed
+        drop_none_params(kwargs)
+        client = self.client(upstream)
+        check_deadline()
+        async with self._bulkheads(upstream):
+            response = await self._call(
+                client, upstream, method, path, stream=True, **kwargs
+            )
+            try:
+                yield response
+            finally:
+                await response.aclose()
+
+    async def _call(
+        self,
+        client: httpx.AsyncClient,
+        upstream: str,
+        method: str,
+        path: str,
+        stream: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        remaining = check_deadline()
+        breaker = self.breakers[upstream]
+        breaker.before_call()
+
+        # Added here and not in request() so the header never splits coalescing keys
+        headers = httpx.Headers(kwargs.pop("headers", None))
+        headers.update(deadline_headers(remaining))
+
+        start = time.monotonic()
+        try:
+            request = client.build_request(
+                method,
+                path,
+                headers=headers,
+                timeout=self._timeout(upstream, remaining),
+                **kwargs,
+            )
+            response = await client.send(request, stream=stream)
+        except httpx.TimeoutException:
+            breaker.record(False, time.monotonic() - start)
+            raise APIException(
+                code=DEADLINE_EXCEEDED_ERROR,
+                msg=f"Tiempo de espera agotado con el servicio {upstream}",
+            )
+        except httpx.RequestError:
+            breaker.record(False, time.monotonic() - start)
+            raise
+        except BaseException:
+            # Cancelled, or the request body failed (e.g. an upload over its limit)
+            breaker.release()
+            raise
+
+        breaker.record(response.status_code < 500, time.monotonic() - start)
+        return response
+
+    def _timeout(self, upstream: str, remaining: Optional[float]) -> httpx.Timeout:
+        timeouts = dict(self.timeouts.get(upstream, {}))
+        timeouts.update(self.route_timeouts.get(route_template(), {}))
+        connect = timeouts.get("connect", UPSTREAM_CONNECT_TIMEOUT)
+        read = timeouts.get("read", UPSTREAM_READ_TIMEOUT)
+
+        # Never wait longer than what is left of the gateway request budget
+        if remaining is not None:
+            connect = min(connect, remaining)
+            read = min(read, remaining)
+
+        return httpx.Timeout(read, connect=connect)
+
+    def _coalescing_key(
+        self, upstream: str, method: str, path: str, kwargs: dict
+    ) -> Optional[tuple]:
+        # Only plain GETs are safe to share between callers
+        if method != "GET" or not set(kwargs) <= {"params", "headers"}:
+            return None
+
+        url = httpx.URL(path, params=kwargs.get("params"))
+        headers = httpx.Headers(kwargs.get("headers"))
+        return (upstream, str(url), tuple(sorted(headers.multi_items())))
+
+    async def get(self, upstream: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "GET", path, **kwargs)
+
+    async def post(self, upstream: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "POST", path, **kwargs)
+
+    async def put(self, upstream: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "PUT", path, **kwargs)
+
+    async def patch(self, upstream: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "PATCH", path, **kwargs)
+
+    async def delete(self, upstream: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(upstream, "DELETE", path, **kwargs)
+
+
+upstream_client = UpstreamClient(UPSTREAM_URLS)
+register_metrics("upstream_singleflight", upstream_client.singleflight.stats)
+register_metrics("upstream_retries", upstream_client.retry_policy.stats)
+register_metrics("upstream_hedging", upstream_client.hedging_policy.stats)
+register_metrics(
+    "bulkheads",
+    lambda: {
+        "upstreams": {
+            upstream: bulkhead.stats()
+            for upstream, bulkhead in upstream_client.bulkheads.items()
+        },
+        "routes": {
+            route: bulkhead.stats()
+            for route, bulkhead in upstream_client.route_bulkheads.items()
+        },
+    },
+)
+register_metrics(
+    "circuit_breakers",
+    lambda: {
+        upstream: breaker.stats()
+        for upstream, breaker in upstream_client.breakers.items()
+    },
+)
@@ -7,9 +7,10 @@ from app.utils.constants import *
 
 
 class APIException(Exception):
-    def __init__(self, code: str, msg: str):
+    def __init__(self, code: str, msg: str, headers: Union[dict, None] = None):
         super().__init__(msg)
         self.code = code
+        self.headers = headers
 
     def get_code(self) -> str:
         return self.code
@@ -26,6 +27,14 @@ class APIExceptionToHTTP:
             USER_UNAUTHORIZED_ERROR: status.HTTP_401_UNAUTHORIZED,
             USER_DOES_NOT_EXISTS_ERROR: status.HTTP_404_NOT_FOUND,
             CONNECTION_ERROR: status.HTTP_401_UNAUTHORIZED,
+            UPSTREAM_UNAVAILABLE_ERROR: status.HTTP_503_SERVICE_UNAVAILABLE,
+            DEADLINE_EXCEEDED_ERROR: status.HTTP_504_GATEWAY_TIMEOUT,
+            UPSTREAM_BUSY_ERROR: status.HTTP_503_SERVICE_UNAVAILABLE,
+            PAYLOAD_TOO_LARGE_ERROR: status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            UNSUPPORTED_MEDIA_TYPE_ERROR: status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            INVALID_IMAGE_ERROR: status.HTTP_400_BAD_REQUEST,
+            PLAN_QUEUE_ERROR: status.HTTP_503_SERVICE_UNAVAILABLE,
+            PLAN_NOT_FOUND_ERROR: status.HTTP_404_NOT_FOUND,
         }
 
     def convert(
@@ -37,6 +46,8 @@ class APIExceptionToHTTP:
             err_code, status.HTTP_500_INTERNAL_SERVER_ERROR
         )
         err_detail = f"{err_code}: {str(err)}"
+        if headers is None:
+            headers = err.headers
         return HTTPException(
             status_code=err_http_status, detail=err_detail, headers=headers
         )
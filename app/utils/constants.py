@@ -6,3 +6,11 @@ LOGIN_ERROR = "LOGIN_ERROR"
 USER_UNAUTHORIZED_ERROR = "USER_UNAUTHORIZED_ERROR"
 USER_DOES_NOT_EXISTS_ERROR = "USER_DOES_NOT_EXISTS_ERROR"
 CONNECTION_ERROR = "INVALID_TOKEN"
+UPSTREAM_UNAVAILABLE_ERROR = "UPSTREAM_UNAVAILABLE_ERROR"
+DEADLINE_EXCEEDED_ERROR = "DEADLINE_EXCEEDED_ERROR"
+UPSTREAM_BUSY_ERROR = "UPSTREAM_BUSY_ERROR"
+PAYLOAD_TOO_LARGE_ERROR = "PAYLOAD_TOO_LARGE_ERROR"
+UNSUPPORTED_MEDIA_TYPE_ERROR = "UNSUPPORTED_MEDIA_TYPE_ERROR"
+INVALID_IMAGE_ERROR = "INVALID_IMAGE_ERROR"
+PLAN_QUEUE_ERROR = "PLAN_QUEUE_ERROR"
+PLAN_NOT_FOUND_ERROR = "PLAN_NOT_FOUND_ERROR"
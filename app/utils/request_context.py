@@ -0,0 +1,17 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# ASGI scope of the gateway request being served, set by DeadlineMiddleware
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+
+def route_template(scope: Optional[dict] = None) -> Optional[str]:
+    # Path template of the matched gateway route, e.g. "/attractions/byid/{attraction_id}"
+    scope = scope if scope is not None else current_scope.get()
+    if scope is None or "endpoint" not in scope or "app" not in scope:
+        return None
+
+    for route in getattr(scope["app"], "routes", []):
+        if getattr(route, "endpoint", None) is scope["endpoint"]:
+            return route.path
+    return None
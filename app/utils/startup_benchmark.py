@@ -0,0 +1,190 @@
+"""
+Cold-start benchmark for the gateway. Every sample imports app.main in a fresh
+interpreter, like a new uvicorn worker does, and reports how long the import
+(and optionally the lifespan startup) took and how much memory the worker
+holds afterwards.
+
+    python -m app.utils.startup_benchmark --runs 10 --lifespan --importtime 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+# Created lazily on first use, importing app.main must never load them
+HEAVY_MODULES = ("boto3", "botocore", "jwt", "cryptography", "PIL")
+
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+PROBE = """
+import json, sys, time
+
+from app.utils.startup_benchmark import HEAVY_MODULES, resident_memory_kb
+
+baseline_rss = resident_memory_kb()
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import_rss = resident_memory_kb()
+
+startup = None
+startup_rss = None
+if sys.argv[1] == "lifespan":
+    import asyncio
+
+    async def run_lifespan():
+        async with app.main.app.router.lifespan_context(app.main.app):
+            return time.perf_counter(), resident_memory_kb()
+
+    ready, startup_rss = asyncio.run(run_lifespan())
+    startup = ready - imported
+
+print(json.dumps({
+    "import_time": imported - start,
+    "startup_time": startup,
+    "baseline_rss_kb": baseline_rss,
+    "import_rss_kb": import_rss,
+    "startup_rss_kb": startup_rss,
+    "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+}))
+"""
+
+
+def resident_memory_kb() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    # Peak instead of current RSS, but available outside Linux
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_probe(lifespan: bool = False) -> dict:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, "lifespan" if lifespan else "import"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    # Interpreter startup included, what a new worker actually waits for
+    sample["process_time"] = time.perf_counter() - start
+    return sample
+
+
+def slowest_imports(limit: int) -> List[tuple]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        imports.append((int(own), int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def summarize(values: List[Optional[float]]) -> Optional[dict]:
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def benchmark(runs: int, lifespan: bool = False) -> dict:
+    samples = [run_probe(lifespan) for _ in range(runs)]
+    return {
+        "runs": runs,
+        "process_time": summarize([s["process_time"] for s in samples]),
+        "import_time": summarize([s["import_time"] for s in samples]),
+        "startup_time": summarize([s["startup_time"] for s in samples]),
+        "baseline_rss_kb": summarize([s["baseline_rss_kb"] for s in samples]),
+        "import_rss_kb": summarize([s["import_rss_kb"] for s in samples]),
+        "startup_rss_kb": summarize([s["startup_rss_kb"] for s in samples]),
+        "heavy_modules": sorted({n for s in samples for n in s["heavy_modules"]}),
+    }
+
+
+def print_report(report: dict, workers: int):
+    print(f"Cold starts: {report['runs']}")
+    for name in ("process_time", "import_time", "startup_time"):
+        stats = report[name]
+        if stats is not None:
+            print(
+                f"  {name:<16} median {stats['median'] * 1000:8.1f} ms"
+                f"  (min {stats['min'] * 1000:.1f}, max {stats['max'] * 1000:.1f})"
+            )
+    for name in ("baseline_rss_kb", "import_rss_kb", "startup_rss_kb"):
+        stats = report[name]
+        if stats is not None:
+            print(
+                f"  {name:<16} median {stats['median'] / 1024:8.1f} MB"
+                f"  (x{workers} workers: {stats['median'] * workers / 1024:.1f} MB)"
+            )
+    print(f"  heavy modules    {', '.join(report['heavy_modules']) or 'none'}")
+
+    if "slowest_imports" in report:
+        print("Slowest imports (self / cumulative ms):")
+        for own, cumulative, name in report["slowest_imports"]:
+            print(f"  {own / 1000:8.1f} {cumulative / 1000:8.1f}  {name}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--lifespan",
+        action="store_true",
+        help="also run the app startup (opens the upstream pools and the outbox)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker count to project memory for"
+    )
+    parser.add_argument(
+        "--importtime",
+        type=int,
+        default=0,
+        metavar="N",
+        help="list the N modules with the slowest own import time",
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.runs, args.lifespan)
+    if args.importtime:
+        report["slowest_imports"] = slowest_imports(args.importtime)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.workers)
+
+
+if __name__ == "__main__":
+    main()
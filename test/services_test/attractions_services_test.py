@@ -1,12 +1,40 @@
+import asyncio
 import unittest
+from unittest.mock import Mock, patch
+
+import httpx
 
 import app
 from app.schemas.attractions_schemas.attractions import AttractionByUser, Location
 from app.services.attractions import *
 
+ATTRACTION_DATA = {
+    "attraction_id": "1",
+    "attraction_name": "Test Attraction",
+    "location": {"latitude": 40.7128, "longitude": -74.0060},
+    "city": "Buenos Aires",
+    "country": "Argentina",
+    "photo": "attraction.jpg",
+    "comments": [],
+    "avg_rating": 4.5,
+    "liked_count": 100,
+    "is_liked": True,
+    "is_saved": False,
+    "user_rating": 5,
+    "is_done": True,
+    "types": ["Museum"],
+    "editorial_summary": "A great place to visit",
+    "google_maps_uri": "https://maps.google.com",
+    "formatted_address": "Santa fe 2990, Buenos Aires, Argentina",
+}
+
 
 class TestAttractionServices(unittest.TestCase):
 
+    def setUp(self):
+        attraction_cache.clear()
+        user_attraction_cache.clear()
+
     def test_parse_attraction_by_id(self):
         data = {
             "attraction_id": "1",
@@ -111,3 +139,151 @@ class TestAttractionServices(unittest.TestCase):
         attractions = parse_attraction_list_info(attractions_list)
 
         self.assertEqual(len(attractions), 2)
+
+    def test_split_attraction_by_user(self):
+        shared_data, user_data = split_attraction_by_user(ATTRACTION_DATA)
+
+        self.assertEqual(
+            user_data,
+            {"is_liked": True, "is_saved": False, "is_done": True, "user_rating": 5},
+        )
+        for field in USER_ATTRACTION_FIELDS:
+            self.assertNotIn(field, shared_data)
+        self.assertEqual(shared_data["liked_count"], 100)
+
+    def test_parse_attraction_by_id_overlays_user_data(self):
+        shared_data, _ = split_attraction_by_user(ATTRACTION_DATA)
+        user_data = {
+            "is_liked": False,
+            "is_saved": True,
+            "is_done": False,
+            "user_rating": None,
+        }
+
+        attraction_by_user = parse_attraction_by_id(shared_data, user_data)
+
+        self.assertEqual(attraction_by_user.attraction_name, "Test Attraction")
+        self.assertFalse(attraction_by_user.is_liked)
+        self.assertTrue(attraction_by_user.is_saved)
+        self.assertFalse(attraction_by_user.is_done)
+        self.assertIsNone(attraction_by_user.user_rating)
+
+    def test_shared_data_reused_across_users(self):
+        cache_attraction("1", 1, ATTRACTION_DATA)
+
+        shared_data, user_data = get_cached_attraction("1", 2)
+
+        self.assertEqual(shared_data["attraction_name"], "Test Attraction")
+        self.assertIsNone(user_data)
+
+        shared_data, user_data = get_cached_attraction("1", 1)
+
+        self.assertTrue(user_data["is_liked"])
+
+    def test_invalidate_user_attraction(self):
+        cache_attraction("1", 1, ATTRACTION_DATA)
+
+        invalidate_user_attraction("1", 1)
+
+        shared_data, user_data = get_cached_attraction("1", 1)
+        self.assertIsNotNone(shared_data)
+        self.assertIsNone(user_data)
+
+    def test_invalidate_attraction(self):
+        cache_attraction("1", 1, ATTRACTION_DATA)
+        cache_attraction("1", 2, ATTRACTION_DATA)
+
+        invalidate_attraction("1", 1)
+
+        self.assertEqual(get_cached_attraction("1", 1), (None, None))
+        shared_data, user_data = get_cached_attraction("1", 2)
+        self.assertIsNone(shared_data)
+        self.assertIsNotNone(user_data)
+
+    def test_invalidate_comment(self):
+        commented = {
+            **ATTRACTION_DATA,
+            "comments": [{"comment_id": 7, "user_id": 1, "comment": "Linda"}],
+        }
+        cache_attraction("1", 1, commented)
+        cache_attraction("2", 1, ATTRACTION_DATA)
+
+        invalidate_comment(7)
+
+        shared_data, user_data = get_cached_attraction("1", 1)
+        self.assertIsNone(shared_data)
+        self.assertIsNotNone(user_data)
+        self.assertIsNotNone(get_cached_attraction("2", 1)[0])
+
+
+class TestAttractionsBatch(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        attraction_cache.clear()
+        user_attraction_cache.clear()
+
+    @patch("app.services.attractions.upstream_client.get")
+    async def test_fetch_attractions_batch_keeps_order_and_item_errors(self, mock_get):
+        async def get(upstream, path, **kwargs):
+            response = Mock()
+            if path.endswith("/missing"):
+                response.status_code = 404
+                response.json.return_value = {"detail": "Attraction not found"}
+            elif path.endswith("/broken"):
+                raise httpx.ConnectError("connection refused")
+            else:
+                await asyncio.sleep(0.01 if path.endswith("/1") else 0)
+                response.status_code = 200
+                response.json.return_value = dict(
+                    ATTRACTION_DATA, attraction_id=path.rsplit("/", 1)[1]
+                )
+            return response
+
+        mock_get.side_effect = get
+
+        items = await fetch_attractions_batch(["1", "missing", "2", "broken"], 7)
+
+        self.assertEqual(
+            [item.attraction_id for item in items], ["1", "missing", "2", "broken"]
+        )
+        self.assertEqual([item.status_code for item in items], [200, 404, 200, 502])
+        self.assertEqual(items[0].attraction.attraction_id, "1")
+        self.assertEqual(items[2].attraction.attraction_id, "2")
+        self.assertIsNone(items[1].attraction)
+        self.assertEqual(items[1].error, "Attraction not found")
+
+    @patch("app.services.attractions.ATTRACTIONS_BATCH_CONCURRENCY", 2)
+    @patch("app.services.attractions.upstream_client.get")
+    async def test_fetch_attractions_batch_bounded_fan_out(self, mock_get):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def get(upstream, path, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = ATTRACTION_DATA
+            return response
+
+        mock_get.side_effect = get
+
+        await fetch_attractions_batch([str(i) for i in range(6)], 7)
+
+        self.assertEqual(max_in_flight, 2)
+
+    @patch("app.services.attractions.upstream_client.get")
+    async def test_fetch_attraction_by_id_uses_cache(self, mock_get):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = ATTRACTION_DATA
+        mock_get.return_value = response
+
+        await fetch_attraction_by_id("1", 7)
+        attraction = await fetch_attraction_by_id("1", 7)
+
+        self.assertEqual(attraction.attraction_name, "Test Attraction")
+        mock_get.assert_called_once()
@@ -1,45 +1,318 @@
+import base64
+import json
+import time
 import unittest
 from unittest.mock import Mock, patch
 
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials
+from jwt.algorithms import RSAAlgorithm
 
 import app
-from app.services.authentication_service import check_authentication, get_user_id
+from app.routers.users.users_router import delete_user_profile
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.authentication_service import (
+    LOCAL_VERIFICATION,
+    forget_user_tokens,
+    get_authenticated_user,
+    signing_keys,
+    token_cache,
+    token_cache_ttl,
+    verify_id_token,
+)
 from app.utils.api_exception import APIException
+from app.utils.constants import *
 
 
-class TestAuthenticationServices(unittest.TestCase):
+def build_token(payload: dict) -> str:
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    return f"header.{encoded.rstrip('=')}.signature"
 
-    @patch("app.services.authentication_service.requests.get")
-    def test_check_authentication_success(self, mock_get):
+
+class TestAuthenticationServices(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        token_cache.clear()
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_verify_id_token_success(self, mock_get):
         mock_response = Mock()
         mock_response.status_code = 200
+        mock_response.json.return_value = 1
+        mock_get.return_value = mock_response
+
+        user_id = await verify_id_token("valid_credentials")
+        self.assertEqual(user_id, 1)
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_verify_id_token_failure(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 401
+        mock_get.return_value = mock_response
+
+        with self.assertRaises(APIException):
+            await app.services.authentication_service.verify_id_token(
+                "invalid_credentials"
+            )
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_verify_id_token_connection_error(self, mock_get):
+        mock_get.side_effect = httpx.ConnectError("connection refused")
+
+        with self.assertRaises(APIException):
+            await verify_id_token("valid_credentials")
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_get_authenticated_user_single_round_trip(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = 1
         mock_get.return_value = mock_response
 
         credentials_dict = {"scheme": "Bearer", "credentials": "valid_credentials"}
         credentials = HTTPAuthorizationCredentials(**credentials_dict)
-        result = check_authentication(credentials)
-        self.assertTrue(result)
+        user = await get_authenticated_user(Request({"type": "http"}), credentials)
+
+        self.assertEqual(user.user_id, 1)
+        self.assertEqual(user.token, "valid_credentials")
+        mock_get.assert_called_once()
 
-    @patch("app.services.authentication_service.requests.get")
-    def test_check_authentication_failure(self, mock_get):
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_get_authenticated_user_failure(self, mock_get):
         mock_response = Mock()
         mock_response.status_code = 401
         mock_get.return_value = mock_response
 
         credentials_dict = {"scheme": "Bearer", "credentials": "invalid_credentials"}
         credentials = HTTPAuthorizationCredentials(**credentials_dict)
-        with self.assertRaises(APIException):
-            app.services.authentication_service.check_authentication(credentials)
+        with self.assertRaises(HTTPException) as context:
+            await get_authenticated_user(Request({"type": "http"}), credentials)
+
+        self.assertEqual(context.exception.status_code, 401)
 
-    @patch("app.services.authentication_service.requests.get")
-    def test_get_user_id_success(self, mock_get):
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_get_authenticated_user_reuses_batch_identity(self, mock_get):
+        batch_user = AuthenticatedUser(user_id=1, token="valid_credentials")
+        request = Request({"type": "http", "state": {"authenticated_user": batch_user}})
+
+        credentials_dict = {"scheme": "Bearer", "credentials": "valid_credentials"}
+        credentials = HTTPAuthorizationCredentials(**credentials_dict)
+        user = await get_authenticated_user(request, credentials)
+
+        self.assertIs(user, batch_user)
+        mock_get.assert_not_called()
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_verified_token_is_cached(self, mock_get):
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = 1
         mock_get.return_value = mock_response
 
-        credentials_dict = {"scheme": "Bearer", "credentials": "valid_credentials"}
-        credentials = HTTPAuthorizationCredentials(**credentials_dict)
-        user_id = app.services.authentication_service.get_user_id(credentials)
+        await verify_id_token("valid_credentials")
+        user_id = await verify_id_token("valid_credentials")
+
         self.assertEqual(user_id, 1)
+        mock_get.assert_called_once()
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_rejected_token_is_negative_cached(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 401
+        mock_get.return_value = mock_response
+
+        for _ in range(3):
+            with self.assertRaises(APIException):
+                await verify_id_token("invalid_credentials")
+
+        mock_get.assert_called_once()
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_auth_service_errors_are_not_cached(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 503
+        mock_get.return_value = mock_response
+
+        for _ in range(2):
+            with self.assertRaises(APIException):
+                await verify_id_token("valid_credentials")
+
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_throttled_check_is_not_cached(self, mock_get):
+        mock_response = Mock()
+        mock_response.status_code = 429
+        mock_get.return_value = mock_response
+
+        for _ in range(2):
+            with self.assertRaises(APIException) as context:
+                await verify_id_token("valid_credentials")
+
+        self.assertEqual(context.exception.get_code(), CONNECTION_ERROR)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("app.routers.users.users_router.upstream_client.delete")
+    @patch("app.services.authentication_service.upstream_client.get")
+    async def test_deleted_user_token_is_evicted(self, mock_get, mock_delete):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = 1
+        mock_get.return_value = mock_response
+        mock_delete.return_value = Mock(
+            status_code=200,
+            json=Mock(
+                return_value={
+                    "id": 1,
+                    "username": "user",
+                    "email": "user@example.com",
+                    "birth_date": "2000-01-01",
+                    "preferences": [],
+                    "city": "Salta",
+                    "avatar_link": None,
+                }
+            ),
+        )
+
+        await verify_id_token("valid_credentials")
+        await verify_id_token("other_device_credentials")
+        await delete_user_profile(
+            AuthenticatedUser(user_id=1, token="valid_credentials")
+        )
+        await verify_id_token("other_device_credentials")
+
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_forget_user_tokens(self):
+        token_cache.set("a", 1, 60)
+        token_cache.set("b", 1, 60)
+        token_cache.set("c", 2, 60)
+
+        forget_user_tokens(1)
+
+        self.assertEqual(len(token_cache), 1)
+        self.assertEqual(token_cache.get("c"), 2)
+
+    def test_token_cache_ttl_capped_by_expiration(self):
+        token = build_token({"exp": time.time() + 30})
+
+        self.assertLessEqual(token_cache_ttl(token), 30)
+
+    def test_expired_token_is_not_cached(self):
+        token = build_token({"exp": time.time() - 1})
+
+        self.assertLessEqual(token_cache_ttl(token), 0)
+
+
+class TestLocalTokenVerification(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        signing_keys.clear()
+
+        self.private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        public_jwk = json.loads(RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        public_jwk.update({"kid": "key-1", "alg": "RS256", "use": "sig"})
+
+        jwks_response = Mock()
+        jwks_response.status_code = 200
+        jwks_response.json.return_value = {"keys": [public_jwk]}
+
+        patchers = [
+            patch(
+                "app.services.authentication_service.AUTH_VERIFICATION_MODE",
+                LOCAL_VERIFICATION,
+            ),
+            patch(
+                "app.services.authentication_service.AUTH_JWT_AUDIENCE",
+                "api-gateway",
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        get_patcher = patch(
+            "app.services.authentication_service.upstream_client.get",
+            return_value=jwks_response,
+        )
+        self.mock_get = get_patcher.start()
+        self.addCleanup(get_patcher.stop)
+
+    def sign(self, claims: dict, kid: str = "key-1", private_key=None) -> str:
+        return jwt.encode(
+            claims,
+            private_key or self.private_key,
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+
+    def claims(self, **overrides) -> dict:
+        claims = {"sub": "7", "aud": "api-gateway", "exp": int(time.time()) + 60}
+        claims.update(overrides)
+        return claims
+
+    async def test_valid_token_verified_without_auth_round_trip(self):
+        first = await verify_id_token(self.sign(self.claims()))
+        second = await verify_id_token(self.sign(self.claims(sub="8")))
+
+        self.assertEqual(first, 7)
+        self.assertEqual(second, 8)
+        # Only the signing keys are fetched, verify_id_token is never called
+        self.mock_get.assert_called_once()
+        self.assertEqual(self.mock_get.call_args.args[1], "/.well-known/jwks.json")
+
+    async def test_expired_token_rejected(self):
+        token = self.sign(self.claims(exp=int(time.time()) - 10))
+
+        with self.assertRaises(APIException):
+            await verify_id_token(token)
+
+    async def test_wrong_audience_rejected(self):
+        token = self.sign(self.claims(aud="another-service"))
+
+        with self.assertRaises(APIException):
+            await verify_id_token(token)
+
+    async def test_bad_signature_rejected(self):
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        token = self.sign(self.claims(), private_key=other_key)
+
+        with self.assertRaises(APIException):
+            await verify_id_token(token)
+
+    async def test_unknown_key_id_refresh_is_rate_limited(self):
+        await verify_id_token(self.sign(self.claims()))
+
+        for sub in ("8", "9"):
+            with self.assertRaises(APIException):
+                await verify_id_token(self.sign(self.claims(sub=sub), kid="key-2"))
+
+        self.mock_get.assert_called_once()
+
+    async def test_invalid_key_set_is_a_connection_error(self):
+        token = self.sign(self.claims())
+        for payload in ([], {"keys": []}, {"keys": [{"kty": "unknown"}]}):
+            signing_keys.clear()
+            self.mock_get.return_value.json.return_value = payload
+
+            with self.assertRaises(APIException) as context:
+                await verify_id_token(token)
+
+            self.assertEqual(context.exception.get_code(), CONNECTION_ERROR)
+
+        self.mock_get.return_value.json.side_effect = ValueError("not json")
+        signing_keys.clear()
+        with self.assertRaises(APIException) as context:
+            await verify_id_token(token)
+
+        self.assertEqual(context.exception.get_code(), CONNECTION_ERROR)
+
+    async def test_malformed_token_rejected(self):
+        with self.assertRaises(APIException):
+            await verify_id_token("not-a-jwt")
@@ -0,0 +1,164 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from fastapi import Request
+from PIL import Image
+
+from app.services.avatar_service import (
+    avatar_upload,
+    avatar_upload_headers,
+    check_avatar_request,
+    resize_image,
+    stream_avatar,
+)
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+
+CONTENT_TYPE = b"multipart/form-data; boundary=abc"
+
+
+def build_request(chunks, headers):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks
+    ]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "headers": headers}
+    return Request(scope, receive)
+
+
+class TestAvatarService(unittest.IsolatedAsyncioTestCase):
+
+    async def test_streams_chunks_unchanged(self):
+        request = build_request([b"a", b"b"], [(b"content-type", CONTENT_TYPE)])
+
+        chunks = [chunk async for chunk in stream_avatar(request)]
+
+        self.assertEqual(b"".join(chunks), b"ab")
+
+    @patch("app.services.avatar_service.AVATAR_MAX_SIZE", 3)
+    async def test_stream_over_limit_is_rejected(self):
+        request = build_request([b"ab", b"cd"], [(b"content-type", CONTENT_TYPE)])
+
+        with self.assertRaises(APIException) as context:
+            async for _ in stream_avatar(request):
+                pass
+
+        self.assertEqual(context.exception.get_code(), PAYLOAD_TOO_LARGE_ERROR)
+
+    async def test_announced_size_over_limit_is_rejected(self):
+        request = build_request(
+            [], [(b"content-type", CONTENT_TYPE), (b"content-length", b"10")]
+        )
+
+        with self.assertRaises(APIException) as context:
+            check_avatar_request(request, 3)
+
+        self.assertEqual(context.exception.get_code(), PAYLOAD_TOO_LARGE_ERROR)
+
+    async def test_non_multipart_is_rejected(self):
+        request = build_request([], [(b"content-type", b"application/json")])
+
+        with self.assertRaises(APIException) as context:
+            check_avatar_request(request, 3)
+
+        self.assertEqual(context.exception.get_code(), UNSUPPORTED_MEDIA_TYPE_ERROR)
+
+    async def test_upload_headers_keep_boundary(self):
+        request = build_request(
+            [], [(b"content-type", CONTENT_TYPE), (b"content-length", b"10")]
+        )
+
+        headers = avatar_upload_headers(request, "token")
+
+        self.assertEqual(headers["Content-Type"], CONTENT_TYPE.decode())
+        self.assertEqual(headers["Content-Length"], "10")
+        self.assertEqual(headers["Authorization"], "Bearer token")
+
+
+def build_image(size, exif=None) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format="JPEG", exif=exif or b"")
+    return output.getvalue()
+
+
+def build_form(image: bytes) -> bytes:
+    return (
+        b"--abc\r\n"
+        b'Content-Disposition: form-data; name="avatar"; filename="a.jpg"\r\n'
+        b"Content-Type: image/jpeg\r\n\r\n" + image + b"\r\n--abc--\r\n"
+    )
+
+
+async def downscale(data):
+    return resize_image(data, 100, "WEBP", 80)
+
+
+class TestAvatarResize(unittest.IsolatedAsyncioTestCase):
+
+    def test_downscales_and_strips_metadata(self):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"
+
+        data = resize_image(build_image((400, 200), exif), 100, "WEBP", 80)
+
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_small_images_are_not_upscaled(self):
+        data = resize_image(build_image((40, 20)), 100, "JPEG", 80)
+
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (40, 20))
+
+    def test_invalid_image(self):
+        self.assertIsNone(resize_image(b"not an image", 100, "WEBP", 80))
+
+    @patch("app.services.avatar_service.AVATAR_MAX_DIMENSION", 0)
+    async def test_disabled_resize_streams_body(self):
+        request = build_request([b"a"], [(b"content-type", CONTENT_TYPE)])
+
+        upload = await avatar_upload(request, "token")
+
+        self.assertEqual(upload["headers"]["Content-Type"], CONTENT_TYPE.decode())
+        self.assertEqual(b"".join([chunk async for chunk in upload["content"]]), b"a")
+
+    @patch("app.services.avatar_service.AVATAR_MAX_DIMENSION", 100)
+    async def test_enabled_resize_forwards_small_file(self):
+        body = build_form(build_image((400, 200)))
+        request = build_request([body], [(b"content-type", CONTENT_TYPE)])
+
+        # The input only has to fit the resize limit, not the forwarded one
+        with patch("app.services.avatar_service.AVATAR_MAX_SIZE", len(body) - 1):
+            with patch("app.services.avatar_service.downscale_avatar", downscale):
+                upload = await avatar_upload(request, "token")
+
+        name, (filename, data, content_type) = upload["files"][0]
+        self.assertEqual(name, "avatar")
+        self.assertEqual(content_type, "image/webp")
+        self.assertEqual(upload["headers"], {"Authorization": "Bearer token"})
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    @patch("app.services.avatar_service.AVATAR_MAX_DIMENSION", 100)
+    async def test_resize_input_over_limit_is_rejected(self):
+        body = build_form(build_image((400, 200)))
+        request = build_request([body], [(b"content-type", CONTENT_TYPE)])
+
+        with patch(
+            "app.services.avatar_service.AVATAR_RESIZE_MAX_INPUT", len(body) - 1
+        ):
+            with self.assertRaises(APIException) as context:
+                await avatar_upload(request, "token")
+
+        self.assertEqual(context.exception.get_code(), PAYLOAD_TOO_LARGE_ERROR)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import unittest
+from typing import Optional
+
+from fastapi import Depends, FastAPI, HTTPException
+
+import app
+from app.schemas.batch_schemas.batch import SubRequest
+from app.schemas.users_schemas.autentication import AuthenticatedUser
+from app.services.authentication_service import get_authenticated_user
+from app.services.batch_service import dispatch_batch
+from app.services.deadline import request_deadline
+
+batch_app = FastAPI()
+
+
+@batch_app.get("/profile")
+async def profile(user: AuthenticatedUser = Depends(get_authenticated_user)):
+    return {"user_id": user.user_id}
+
+
+@batch_app.get("/weather")
+async def weather(city: str, days: Optional[int] = 5):
+    return {"city": city, "days": days}
+
+
+@batch_app.post("/echo", status_code=201)
+async def echo(data: dict):
+    return data
+
+
+@batch_app.get("/missing")
+async def missing():
+    raise HTTPException(status_code=404, detail="Not found")
+
+
+@batch_app.get("/slow")
+async def slow():
+    await asyncio.sleep(10)
+
+
+@batch_app.get("/broken")
+async def broken():
+    raise RuntimeError("boom")
+
+
+class TestBatchService(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.user = AuthenticatedUser(user_id=7, token="token")
+
+    async def dispatch(self, *sub_requests):
+        return await dispatch_batch(
+            batch_app, [SubRequest(**r) for r in sub_requests], self.user, {}
+        )
+
+    async def test_sub_requests_run_in_order_under_one_identity(self):
+        responses = await self.dispatch(
+            {"path": "/profile"},
+            {"path": "/weather", "query": {"city": "Salta"}},
+            {"method": "POST", "path": "/echo", "body": {"a": 1}},
+        )
+
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertEqual(responses[0].body, {"user_id": 7})
+        self.assertEqual(responses[1].body, {"city": "Salta", "days": 5})
+        self.assertEqual(responses[2].status_code, 201)
+        self.assertEqual(responses[2].body, {"a": 1})
+
+    async def test_query_in_path_is_merged(self):
+        responses = await self.dispatch(
+            {"path": "/weather?city=Salta", "query": {"days": 3}},
+        )
+
+        self.assertEqual(responses[0].body, {"city": "Salta", "days": 3})
+
+    async def test_errors_are_reported_per_sub_request(self):
+        responses = await self.dispatch(
+            {"path": "/missing"},
+            {"path": "/broken"},
+            {"path": "/unknown"},
+            {"path": "/profile"},
+        )
+
+        self.assertEqual(
+            [response.status_code for response in responses], [404, 500, 404, 200]
+        )
+        self.assertEqual(responses[0].body, {"detail": "Not found"})
+
+    async def test_nested_batch_and_bad_methods_are_rejected(self):
+        responses = await self.dispatch(
+            {"method": "POST", "path": "/batch"},
+            {"method": "OPTIONS", "path": "/profile"},
+            {"path": "profile"},
+            {"path": "/plan/events/abc"},
+            {"method": "POST", "path": "/chatbot/send_message/stream"},
+        )
+
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [400, 405, 400, 400, 400],
+        )
+
+    async def test_sub_request_bounded_by_batch_deadline(self):
+        token = request_deadline.set(time.monotonic() + 0.05)
+        try:
+            responses = await self.dispatch({"path": "/slow"}, {"path": "/profile"})
+        finally:
+            request_deadline.reset(token)
+
+        self.assertEqual(responses[0].status_code, 504)
+        self.assertEqual(responses[1].status_code, 200)
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+import httpx
+
+from app.services.bulkhead import Bulkhead
+from app.services.upstream_client import ATTRACTIONS, UpstreamClient
+from app.utils.api_exception import APIException, APIExceptionToHTTP
+from app.utils.constants import *
+
+
+class TestBulkhead(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.bulkhead = Bulkhead("chatbot", max_concurrent=1, max_queue=1)
+
+    async def test_waits_for_a_free_slot(self):
+        await self.bulkhead.acquire()
+        waiter = asyncio.ensure_future(self.bulkhead.acquire())
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.bulkhead.stats()["waiting"], 1)
+
+        self.bulkhead.release()
+        await waiter
+
+        self.assertEqual(self.bulkhead.stats()["active"], 1)
+        self.assertEqual(self.bulkhead.stats()["waiting"], 0)
+
+    async def test_full_queue_is_rejected(self):
+        await self.bulkhead.acquire()
+        waiter = asyncio.ensure_future(self.bulkhead.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(APIException) as context:
+            await self.bulkhead.acquire()
+
+        error = APIExceptionToHTTP().convert(context.exception)
+        self.assertEqual(error.status_code, 503)
+        self.assertEqual(error.headers, {"Retry-After": "1"})
+        self.assertEqual(self.bulkhead.stats()["rejected"], 1)
+
+        waiter.cancel()
+
+    async def test_wait_is_bounded_by_timeout(self):
+        await self.bulkhead.acquire()
+
+        with self.assertRaises(APIException) as context:
+            await self.bulkhead.acquire(timeout=0.01)
+
+        self.assertEqual(context.exception.get_code(), DEADLINE_EXCEEDED_ERROR)
+        self.assertEqual(self.bulkhead.stats()["waiting"], 0)
+
+
+class TestUpstreamBulkhead(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.release = asyncio.Event()
+
+        async def handler(request: httpx.Request):
+            await self.release.wait()
+            return httpx.Response(200, json={})
+
+        self.upstream = UpstreamClient({ATTRACTIONS: "http://attractions"})
+        self.upstream.bulkheads[ATTRACTIONS] = Bulkhead(
+            ATTRACTIONS, max_concurrent=1, max_queue=0
+        )
+        self.upstream.clients[ATTRACTIONS] = httpx.AsyncClient(
+            base_url="http://attractions", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    async def test_slot_is_held_during_the_call(self):
+        first = asyncio.ensure_future(self.upstream.post(ATTRACTIONS, "/a"))
+        await asyncio.sleep(0.01)
+
+        with self.assertRaises(APIException) as context:
+            await self.upstream.post(ATTRACTIONS, "/b")
+        self.assertEqual(context.exception.get_code(), UPSTREAM_BUSY_ERROR)
+
+        self.release.set()
+        await first
+
+        self.assertEqual(self.upstream.bulkheads[ATTRACTIONS].stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
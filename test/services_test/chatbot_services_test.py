@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import HTTPException
+
+from app.services.external_services.chatbot_services import open_assistant_stream
+from app.services.upstream_client import EXTERNAL_SERVICES, UpstreamClient
+from app.utils.sse import sse_event
+
+
+def stub_stream(*chunks, content_type="text/plain"):
+    async def body():
+        for chunk in chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+    return httpx.Response(200, content=body(), headers={"content-type": content_type})
+
+
+class TestSSEEvent(unittest.TestCase):
+
+    def test_single_line(self):
+        self.assertEqual(sse_event("hola"), b"data: hola\n\n")
+
+    def test_multi_line_with_event(self):
+        self.assertEqual(
+            sse_event("a\nb", event="done"), b"event: done\ndata: a\ndata: b\n\n"
+        )
+
+
+class TestAssistantStream(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.paths = []
+        self.response = None
+
+        def handler(request: httpx.Request):
+            self.paths.append(request.url.path)
+            return self.response
+
+        self.upstream = UpstreamClient({EXTERNAL_SERVICES: "http://external"})
+        self.upstream.clients[EXTERNAL_SERVICES] = httpx.AsyncClient(
+            base_url="http://external", transport=httpx.MockTransport(handler)
+        )
+        patcher = patch(
+            "app.services.external_services.chatbot_services.upstream_client",
+            self.upstream,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    async def read(self, stream):
+        return b"".join([chunk async for chunk in stream])
+
+    async def test_text_chunks_become_events(self):
+        self.response = stub_stream(b"Hola", b" mundo")
+
+        stream = await open_assistant_stream(7, "hi")
+
+        self.assertEqual(
+            await self.read(stream),
+            b"data: Hola\n\ndata:  mundo\n\nevent: done\ndata: \n\n",
+        )
+        self.assertEqual(self.paths, ["/chatbot/send_message/7/stream"])
+
+    async def test_upstream_events_are_relayed(self):
+        self.response = stub_stream(
+            b"data: Hola\n\n",
+            b"event: done\ndata: \n\n",
+            content_type="text/event-stream",
+        )
+
+        stream = await open_assistant_stream(7, "hi")
+
+        self.assertEqual(
+            await self.read(stream), b"data: Hola\n\nevent: done\ndata: \n\n"
+        )
+
+    async def test_bulkhead_slot_held_while_streaming(self):
+        self.response = stub_stream(b"Hola")
+        bulkhead = self.upstream.bulkheads[EXTERNAL_SERVICES]
+
+        stream = await open_assistant_stream(7, "hi")
+        self.assertEqual(bulkhead.active, 1)
+
+        await self.read(stream)
+        self.assertEqual(bulkhead.active, 0)
+
+    async def test_upstream_error_keeps_status(self):
+        self.response = httpx.Response(404, json={"detail": "User not found"})
+
+        with self.assertRaises(HTTPException) as context:
+            await open_assistant_stream(7, "hi")
+
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertEqual(self.upstream.bulkheads[EXTERNAL_SERVICES].active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
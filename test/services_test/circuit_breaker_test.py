@@ -0,0 +1,142 @@
+import unittest
+
+import httpx
+
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.retry_policy import RetryBudget, RetryPolicy
+from app.services.upstream_client import ATTRACTIONS, UpstreamClient
+from app.utils.api_exception import APIException, APIExceptionToHTTP
+from app.utils.constants import *
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            "attractions",
+            failure_rate_threshold=0.5,
+            slow_call_rate_threshold=0.5,
+            slow_call_duration=1,
+            window_size=4,
+            minimum_calls=4,
+            open_duration=10,
+            half_open_calls=2,
+            clock=self.clock,
+        )
+
+    def call(self, success=True, duration=0.1):
+        self.breaker.before_call()
+        self.breaker.record(success, duration)
+
+    def open_breaker(self):
+        for _ in range(4):
+            self.call(success=False)
+
+    def test_stays_closed_below_minimum_calls(self):
+        for _ in range(3):
+            self.call(success=False)
+
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_opens_on_failure_rate(self):
+        self.call()
+        self.call()
+        self.call(success=False)
+        self.call(success=False)
+
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_opens_on_slow_calls(self):
+        self.call()
+        self.call()
+        self.call(duration=2)
+        self.call(duration=2)
+
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_open_breaker_fails_fast(self):
+        self.open_breaker()
+
+        with self.assertRaises(APIException) as context:
+            self.breaker.before_call()
+
+        self.assertEqual(context.exception.get_code(), UPSTREAM_UNAVAILABLE_ERROR)
+        self.assertEqual(
+            APIExceptionToHTTP().convert(context.exception).status_code, 503
+        )
+        self.assertEqual(self.breaker.stats()["rejected_calls"], 1)
+
+    def test_half_open_limits_probe_calls(self):
+        self.open_breaker()
+        self.clock.now = 10
+
+        self.breaker.before_call()
+        self.breaker.before_call()
+
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(APIException):
+            self.breaker.before_call()
+
+    def test_successful_probes_close(self):
+        self.open_breaker()
+        self.clock.now = 10
+
+        self.call()
+        self.call()
+
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        self.open_breaker()
+        self.clock.now = 10
+
+        self.call(success=False)
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()["times_opened"], 2)
+
+
+class TestUpstreamClientBreaker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = 0
+
+        def handler(request: httpx.Request):
+            self.calls += 1
+            return httpx.Response(503)
+
+        self.upstream = UpstreamClient({ATTRACTIONS: "http://attractions"})
+        self.upstream.breakers[ATTRACTIONS] = CircuitBreaker(
+            ATTRACTIONS, window_size=2, minimum_calls=2
+        )
+        self.upstream.retry_policy = RetryPolicy(RetryBudget(), max_attempts=1)
+        self.upstream.clients[ATTRACTIONS] = httpx.AsyncClient(
+            base_url="http://attractions", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    async def test_server_errors_open_the_breaker(self):
+        await self.upstream.get(ATTRACTIONS, "/metadata")
+        await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        with self.assertRaises(APIException):
+            await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.upstream.breakers[ATTRACTIONS].state, OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,15 @@
+import json
+import os
+import tempfile
 import unittest
 
 import app
 from app.schemas.external_services_schemas.cities import Cities, City
-from app.services.external_services.cities_services import parse_cities
+from app.services.external_services.cities_services import (
+    CityPrefixIndex,
+    normalize_city_name,
+    parse_cities,
+)
 
 
 class TestCitiesServices(unittest.TestCase):
@@ -38,3 +45,82 @@ class TestCitiesServices(unittest.TestCase):
             self.assertEqual(city.country, cities_data[idx]["country"])
             self.assertEqual(city.state_code, cities_data[idx]["state_code"])
             self.assertEqual(city.latitude, cities_data[idx]["latitude"])
+
+
+class TestCityPrefixIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CityPrefixIndex()
+        self.index.load(
+            [
+                {
+                    "name": "Córdoba",
+                    "country": "Argentina",
+                    "state_code": "X",
+                    "latitude": -31.4,
+                    "longitude": -64.18,
+                },
+                {
+                    "name": "Corrientes",
+                    "country": "Argentina",
+                    "state_code": "W",
+                    "latitude": -27.46,
+                    "longitude": -58.83,
+                },
+                {
+                    "name": "San Miguel de Tucumán",
+                    "country": "Argentina",
+                    "state_code": "T",
+                    "latitude": -26.8,
+                    "longitude": -65.2,
+                },
+            ]
+        )
+
+    def test_normalize_city_name(self):
+        self.assertEqual(
+            normalize_city_name("  San  Miguel de TUCUMÁN "), "san miguel de tucuman"
+        )
+
+    def test_prefix_search_is_case_and_accent_insensitive(self):
+        cities = self.index.search("CORDO")
+
+        self.assertEqual([city.name for city in cities], ["Córdoba"])
+        self.assertIsInstance(cities[0], City)
+        self.assertEqual(cities[0].state_code, "X")
+
+    def test_prefix_search_returns_every_match_in_order(self):
+        cities = self.index.search("cor")
+
+        self.assertEqual([city.name for city in cities], ["Córdoba", "Corrientes"])
+
+    def test_prefix_search_limit(self):
+        self.assertEqual(len(self.index.search("cor", limit=1)), 1)
+
+    def test_prefix_search_miss(self):
+        self.assertEqual(self.index.search("Salta"), [])
+        self.assertEqual(self.index.search("   "), [])
+        self.assertEqual(self.index.misses, 2)
+
+    def test_load_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as dataset:
+            json.dump(
+                {
+                    "cities": [
+                        {
+                            "name": "Salta",
+                            "country": "Argentina",
+                            "state_code": "A",
+                            "latitude": -24.78,
+                            "longitude": -65.41,
+                        }
+                    ]
+                },
+                dataset,
+            )
+        self.addCleanup(os.remove, dataset.name)
+
+        self.index.load_file(dataset.name)
+
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.search("sal")[0].name, "Salta")
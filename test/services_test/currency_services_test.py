@@ -0,0 +1,35 @@
+import unittest
+
+import app
+from app.schemas.external_services_schemas.currency import Currency
+from app.services.external_services.currency_services import (
+    convert_currency,
+    currency_pair_key,
+    parse_currency_rate,
+)
+
+
+class TestCurrencyServices(unittest.TestCase):
+
+    def test_currency_pair_key(self):
+        self.assertEqual(currency_pair_key(" usd", "Ars "), ("USD", "ARS"))
+
+    def test_parse_currency_rate(self):
+        currency_data = {"base_code": "USD", "target_code": "ARS", "conversion": 900.5}
+
+        currency_rate = parse_currency_rate(currency_data)
+
+        self.assertEqual(currency_rate["base_code"], "USD")
+        self.assertEqual(currency_rate["target_code"], "ARS")
+        self.assertEqual(currency_rate["rate"], 900.5)
+
+    def test_convert_currency_for_any_amount(self):
+        currency_rate = {"base_code": "USD", "target_code": "ARS", "rate": 900.5}
+
+        for amount in (0, 1, 2.5, 1000):
+            currency = convert_currency(currency_rate, amount)
+
+            self.assertIsInstance(currency, Currency)
+            self.assertEqual(currency.base_code, "USD")
+            self.assertEqual(currency.target_code, "ARS")
+            self.assertAlmostEqual(currency.conversion, 900.5 * amount)
@@ -0,0 +1,163 @@
+import asyncio
+import time
+import unittest
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.deadline import (
+    DEADLINE_HEADER,
+    DeadlineMiddleware,
+    remaining_time,
+    request_deadline,
+)
+from app.services.upstream_client import ATTRACTIONS, UpstreamClient
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+from app.utils.request_context import route_template
+
+deadline_app = FastAPI()
+deadline_app.add_middleware(DeadlineMiddleware, timeout=10)
+
+
+@deadline_app.get("/items/{item_id}")
+async def get_item(item_id: str):
+    return {"remaining": remaining_time(), "route": route_template()}
+
+
+class TestDeadlineMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(deadline_app)
+
+    def test_request_gets_default_budget(self):
+        response = self.client.get("/items/1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(9 < response.json()["remaining"] <= 10)
+        self.assertEqual(response.json()["route"], "/items/{item_id}")
+
+    def test_client_can_shorten_budget(self):
+        response = self.client.get("/items/1", headers={DEADLINE_HEADER: "2000"})
+
+        self.assertTrue(1 < response.json()["remaining"] <= 2)
+
+    def test_client_cannot_extend_budget(self):
+        response = self.client.get("/items/1", headers={DEADLINE_HEADER: "60000"})
+
+        self.assertTrue(response.json()["remaining"] <= 10)
+
+    def test_expired_budget_is_rejected(self):
+        response = self.client.get("/items/1", headers={DEADLINE_HEADER: "0"})
+
+        self.assertEqual(response.status_code, 504)
+
+
+class TestUpstreamDeadline(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.requests = []
+
+        def handler(request: httpx.Request):
+            self.requests.append(request)
+            return httpx.Response(200, json={})
+
+        self.upstream = UpstreamClient(
+            {ATTRACTIONS: "http://attractions"},
+            timeouts={ATTRACTIONS: {"connect": 1, "read": 20}},
+        )
+        self.upstream.clients[ATTRACTIONS] = httpx.AsyncClient(
+            base_url="http://attractions", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    async def test_no_deadline_uses_upstream_timeouts(self):
+        await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        timeout = self.requests[0].extensions["timeout"]
+        self.assertEqual(timeout["connect"], 1)
+        self.assertEqual(timeout["read"], 20)
+        self.assertNotIn(DEADLINE_HEADER, self.requests[0].headers)
+
+    async def test_remaining_budget_is_forwarded(self):
+        token = request_deadline.set(time.monotonic() + 5)
+        try:
+            await self.upstream.get(ATTRACTIONS, "/metadata", coalesce=False)
+        finally:
+            request_deadline.reset(token)
+
+        timeout = self.requests[0].extensions["timeout"]
+        self.assertEqual(timeout["connect"], 1)
+        self.assertTrue(4 < timeout["read"] <= 5)
+        self.assertTrue(4000 < int(self.requests[0].headers[DEADLINE_HEADER]) <= 5000)
+
+    async def test_expired_deadline_skips_upstream(self):
+        token = request_deadline.set(time.monotonic() - 1)
+        try:
+            with self.assertRaises(APIException) as context:
+                await self.upstream.get(ATTRACTIONS, "/metadata")
+        finally:
+            request_deadline.reset(token)
+
+        self.assertEqual(context.exception.get_code(), DEADLINE_EXCEEDED_ERROR)
+        self.assertEqual(self.requests, [])
+
+    async def test_coalesced_call_ignores_caller_deadline(self):
+        token = request_deadline.set(time.monotonic() + 5)
+        try:
+            await self.upstream.get(ATTRACTIONS, "/metadata")
+        finally:
+            request_deadline.reset(token)
+
+        timeout = self.requests[0].extensions["timeout"]
+        self.assertEqual(timeout["read"], 20)
+        self.assertNotIn(DEADLINE_HEADER, self.requests[0].headers)
+
+    async def test_coalesced_callers_keep_their_own_budget(self):
+        async def handler(request: httpx.Request):
+            self.requests.append(request)
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json={})
+
+        self.upstream.clients[ATTRACTIONS] = httpx.AsyncClient(
+            base_url="http://attractions", transport=httpx.MockTransport(handler)
+        )
+
+        async def call(budget: float):
+            request_deadline.set(time.monotonic() + budget)
+            return await self.upstream.get(ATTRACTIONS, "/cities")
+
+        # The caller with the tiny budget starts the shared call
+        short = asyncio.create_task(call(0.05))
+        await asyncio.sleep(0)
+        long = asyncio.create_task(call(30))
+
+        with self.assertRaises(APIException) as context:
+            await short
+        response = await long
+
+        self.assertEqual(context.exception.get_code(), DEADLINE_EXCEEDED_ERROR)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.requests[0].extensions["timeout"]["read"], 20)
+        self.assertEqual(self.upstream.singleflight.coalesced, 1)
+
+    async def test_upstream_timeout_is_mapped(self):
+        def handler(request: httpx.Request):
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        self.upstream.clients[ATTRACTIONS] = httpx.AsyncClient(
+            base_url="http://attractions", transport=httpx.MockTransport(handler)
+        )
+
+        with self.assertRaises(APIException) as context:
+            await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(context.exception.get_code(), DEADLINE_EXCEEDED_ERROR)
+
+
+if __name__ == "__main__":
+    unittest.main()
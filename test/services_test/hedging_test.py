@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+import httpx
+
+from app.services.hedging import HedgingPolicy, LatencyTracker
+from app.services.retry_policy import RetryBudget
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_quantile(self):
+        tracker = LatencyTracker(window_size=100)
+        for latency in range(1, 101):
+            tracker.record(latency / 100)
+
+        self.assertEqual(tracker.quantile(0.95), 0.95)
+        self.assertEqual(tracker.quantile(0.5), 0.5)
+
+    def test_window_drops_old_samples(self):
+        tracker = LatencyTracker(window_size=2)
+        for latency in (10, 1, 1):
+            tracker.record(latency)
+
+        self.assertEqual(tracker.quantile(0.95), 1)
+
+
+class TestHedgingPolicy(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.policy = HedgingPolicy(
+            RetryBudget(ratio=1, min_per_second=0), min_samples=1, min_delay=0
+        )
+        self.policy.trackers["background"].record(0.01)
+        self.cancelled = 0
+
+    def send_with_delays(self, *delays):
+        delays = list(delays)
+
+        async def send():
+            delay = delays.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            return httpx.Response(200, json={"delay": delay})
+
+        return send
+
+    async def test_slow_request_is_hedged(self):
+        response = await self.policy.run(self.send_with_delays(1, 0))
+        await asyncio.sleep(0)
+
+        self.assertEqual(response.json(), {"delay": 0})
+        self.assertEqual(self.cancelled, 1)
+        self.assertEqual(self.policy.hedged["background"], 1)
+        self.assertEqual(self.policy.hedges_won["background"], 1)
+
+    async def test_fast_request_is_not_hedged(self):
+        response = await self.policy.run(self.send_with_delays(0, 0))
+
+        self.assertEqual(response.json(), {"delay": 0})
+        self.assertEqual(self.policy.hedged["background"], 0)
+
+    async def test_no_hedge_without_samples(self):
+        self.policy.trackers.clear()
+
+        response = await self.policy.run(self.send_with_delays(0.05, 0))
+
+        self.assertEqual(response.json(), {"delay": 0.05})
+        self.assertEqual(self.policy.hedged["background"], 0)
+
+    async def test_no_hedge_without_budget(self):
+        self.policy.budget = RetryBudget(ratio=0, min_per_second=0)
+
+        response = await self.policy.run(self.send_with_delays(0.05, 0))
+
+        self.assertEqual(response.json(), {"delay": 0.05})
+        self.assertEqual(self.policy.hedged["background"], 0)
+
+    async def test_failed_hedge_falls_back_to_first(self):
+        calls = []
+
+        async def send():
+            calls.append(len(calls))
+            if len(calls) == 2:
+                raise httpx.ConnectError("refused")
+            await asyncio.sleep(0.05)
+            return httpx.Response(200)
+
+        response = await self.policy.run(send)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.policy.hedges_won["background"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, patch
+
+from fastapi import HTTPException
+
+import app
+from app.services.metadata_cache import MetadataCache, build_etag, etag_matches
+
+
+def metadata_response(content: bytes, status_code: int = 200):
+    response = Mock()
+    response.status_code = status_code
+    response.content = content
+    response.json.return_value = {"detail": "error"}
+    return response
+
+
+class TestMetadataCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.cache = MetadataCache(refresh_interval=60)
+
+    async def asyncTearDown(self):
+        await self.cache.stop()
+
+    @patch("app.services.metadata_cache.upstream_client.get")
+    async def test_first_get_fetches_and_then_serves_from_memory(self, mock_get):
+        mock_get.return_value = metadata_response(b'{"version": 1}')
+
+        payload, etag = await self.cache.get()
+        await self.cache.get()
+
+        self.assertEqual(payload, b'{"version": 1}')
+        self.assertEqual(etag, build_etag(b'{"version": 1}'))
+        mock_get.assert_called_once()
+
+    @patch("app.services.metadata_cache.upstream_client.get")
+    async def test_stale_copy_served_while_refreshing(self, mock_get):
+        mock_get.return_value = metadata_response(b'{"version": 1}')
+        await self.cache.get()
+
+        release = asyncio.Event()
+
+        async def slow_refresh(*args, **kwargs):
+            await release.wait()
+            return metadata_response(b'{"version": 2}')
+
+        mock_get.side_effect = slow_refresh
+        self.cache.fetched_at -= 120
+
+        payload, _ = await self.cache.get()
+        self.assertEqual(payload, b'{"version": 1}')
+
+        release.set()
+        await self.cache.refresh_task
+
+        payload, _ = await self.cache.get()
+        self.assertEqual(payload, b'{"version": 2}')
+
+    @patch("app.services.metadata_cache.upstream_client.get")
+    async def test_failed_refresh_keeps_stale_copy(self, mock_get):
+        mock_get.return_value = metadata_response(b'{"version": 1}')
+        await self.cache.get()
+
+        mock_get.return_value = metadata_response(b"", status_code=500)
+        await self.cache.refresh_quietly()
+
+        payload, _ = await self.cache.get()
+        self.assertEqual(payload, b'{"version": 1}')
+        self.assertEqual(self.cache.refresh_errors, 1)
+
+    @patch("app.services.metadata_cache.upstream_client.get")
+    async def test_first_fetch_error_is_raised(self, mock_get):
+        mock_get.return_value = metadata_response(b"", status_code=500)
+
+        with self.assertRaises(HTTPException):
+            await self.cache.get()
+
+
+class TestEtagMatches(unittest.TestCase):
+
+    def test_etag_matches(self):
+        etag = build_etag(b"{}")
+
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from app.services.plan_outbox import PlanOutbox
+from app.services.plan_publisher import PlanPublisher
+
+
+class LocalQueue:
+    """
+    Stand-in for SQS that can be switched off to simulate an outage
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.available = True
+
+    def send_message_batch(self, messages):
+        if not self.available:
+            raise ConnectionError("sqs unreachable")
+        self.messages.extend(messages)
+        return {"Successful": [{"Id": str(i)} for i in range(len(messages))]}
+
+
+class TestPlanOutbox(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "outbox.sqlite3")
+        self.queue = LocalQueue()
+        self.publisher = PlanPublisher(
+            send_batch=self.queue.send_message_batch, linger=0
+        )
+        self.outbox = self.build_outbox()
+
+    async def asyncTearDown(self):
+        await self.outbox.stop()
+        self.directory.cleanup()
+
+    def build_outbox(self):
+        return PlanOutbox(
+            path=self.path,
+            publisher=self.publisher,
+            poll_interval=0.01,
+            retry_base_delay=0,
+        )
+
+    async def test_add_persists_before_sending(self):
+        await self.outbox.add({"plan_name": "a"})
+
+        self.assertEqual(self.outbox.stats()["depth"], 1)
+        self.assertEqual(self.queue.messages, [])
+
+    async def test_drain_forwards_and_deletes(self):
+        await self.outbox.add({"plan_name": "a"})
+        await self.outbox.add({"plan_name": "b"})
+
+        await self.outbox.drain()
+
+        self.assertEqual(self.queue.messages, [{"plan_name": "a"}, {"plan_name": "b"}])
+        self.assertEqual(self.outbox.stats()["depth"], 0)
+        self.assertEqual(await self.outbox.drain(), 0)
+
+    async def test_failed_entries_are_kept_for_retry(self):
+        self.queue.available = False
+        await self.outbox.add({"plan_name": "a"})
+
+        await self.outbox.drain()
+
+        self.assertEqual(self.outbox.stats()["depth"], 1)
+        self.assertEqual(self.outbox.stats()["retries"], 1)
+        self.assertEqual(self.outbox.due(10)[0][1], 1)
+
+        self.queue.available = True
+        await self.outbox.drain()
+
+        self.assertEqual(self.queue.messages, [{"plan_name": "a"}])
+        self.assertEqual(self.outbox.stats()["depth"], 0)
+
+    async def test_entries_survive_restart(self):
+        await self.outbox.add({"plan_name": "a"})
+        await self.outbox.stop()
+
+        self.outbox = self.build_outbox()
+        await self.outbox.start()
+
+        self.assertEqual(self.outbox.stats()["depth"], 1)
+
+    async def test_background_drainer(self):
+        await self.outbox.start()
+
+        await self.outbox.add({"plan_name": "a"})
+        for _ in range(100):
+            if self.queue.messages:
+                break
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(self.queue.messages, [{"plan_name": "a"}])
+
+    async def test_stop_finishes_the_batch_being_drained(self):
+        self.publisher.linger = 0.05
+        self.publisher.start()
+        for n in range(15):
+            await self.outbox.add({"plan_name": str(n)})
+        await self.outbox.start()
+        await asyncio.sleep(0.01)
+
+        await self.outbox.stop()
+        await self.publisher.stop()
+
+        self.assertEqual(len(self.queue.messages), 15)
+        self.assertEqual(self.outbox.stats()["depth"], 0)
+
+    def test_retry_delay_is_capped(self):
+        outbox = PlanOutbox(path=self.path, retry_base_delay=1, retry_max_delay=60)
+
+        self.assertEqual(outbox.retry_delay(0), 1)
+        self.assertEqual(outbox.retry_delay(3), 8)
+        self.assertEqual(outbox.retry_delay(10), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
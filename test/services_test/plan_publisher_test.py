@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services.plan_publisher import (
+    PlanPublisher,
+    plan_deduplication_id,
+    send_message_batch,
+)
+from app.utils.api_exception import APIException
+from app.utils.constants import *
+
+
+class LocalSQS:
+    """
+    Stand-in for the SQS SendMessageBatch call
+    """
+
+    def __init__(self, failed_ids=()):
+        self.batches = []
+        self.threads = []
+        self.failed_ids = set(failed_ids)
+
+    def send_message_batch(self, messages):
+        self.threads.append(threading.current_thread())
+        self.batches.append(messages)
+        failed = [
+            {"Id": str(i)} for i in range(len(messages)) if str(i) in self.failed_ids
+        ]
+        return {
+            "Successful": [{"Id": str(i)} for i in range(len(messages))],
+            "Failed": failed,
+        }
+
+
+class TestPlanPublisher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.sqs = LocalSQS()
+        self.publisher = PlanPublisher(
+            send_batch=self.sqs.send_message_batch, batch_size=3, linger=0.05
+        )
+        self.publisher.start()
+
+    async def asyncTearDown(self):
+        await self.publisher.stop()
+
+    async def test_full_batch_is_sent_together(self):
+        await asyncio.gather(*[self.publisher.publish({"n": n}) for n in range(3)])
+
+        self.assertEqual(self.sqs.batches, [[{"n": 0}, {"n": 1}, {"n": 2}]])
+        self.assertIsNot(self.sqs.threads[0], threading.current_thread())
+
+    async def test_partial_batch_is_sent_after_linger(self):
+        await self.publisher.publish({"n": 0})
+
+        self.assertEqual(self.sqs.batches, [[{"n": 0}]])
+
+    async def test_batches_are_split(self):
+        await asyncio.gather(*[self.publisher.publish({"n": n}) for n in range(5)])
+
+        self.assertEqual([len(batch) for batch in self.sqs.batches], [3, 2])
+        self.assertEqual(self.publisher.stats()["messages_sent"], 5)
+
+    async def test_failed_entry_raises(self):
+        self.sqs.failed_ids = {"1"}
+
+        results = await asyncio.gather(
+            *[self.publisher.publish({"n": n}) for n in range(3)],
+            return_exceptions=True,
+        )
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], APIException)
+        self.assertEqual(results[1].get_code(), PLAN_QUEUE_ERROR)
+        self.assertIsNone(results[2])
+
+    async def test_sqs_error_fails_the_batch(self):
+        def fail(messages):
+            raise RuntimeError("sqs down")
+
+        self.publisher.send_batch = fail
+
+        with self.assertRaises(APIException):
+            await self.publisher.publish({"n": 0})
+
+        self.assertEqual(self.publisher.stats()["messages_failed"], 1)
+
+    async def test_full_buffer_is_rejected(self):
+        await self.publisher.stop()
+        self.publisher.max_buffer = 1
+        self.publisher.linger = 10
+        self.publisher.start()
+        self.publisher.buffer.put_nowait(({"n": 0}, asyncio.Future()))
+
+        with self.assertRaises(APIException):
+            await self.publisher.publish({"n": 1})
+
+    async def test_stop_flushes_buffered_messages(self):
+        self.publisher.linger = 10
+        publish = asyncio.ensure_future(self.publisher.publish({"n": 0}))
+        await asyncio.sleep(0.01)
+
+        await self.publisher.stop()
+        await publish
+
+        self.assertEqual(self.sqs.batches, [[{"n": 0}]])
+
+    async def test_cancelled_messages_are_not_sent(self):
+        self.publisher.linger = 10
+        kept = asyncio.ensure_future(self.publisher.publish({"n": 0}))
+        cancelled = asyncio.ensure_future(self.publisher.publish({"n": 1}))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+
+        await self.publisher.stop()
+        await kept
+
+        self.assertEqual(self.sqs.batches, [[{"n": 0}]])
+
+
+PLAN = {
+    "user_id": 7,
+    "plan_name": "Vacaciones",
+    "destination": "Bariloche",
+    "init_date": "2024-07-01",
+    "end_date": "2024-07-10",
+}
+
+
+class TestPlanDeduplication(unittest.TestCase):
+
+    def test_same_plan_same_id(self):
+        self.assertEqual(plan_deduplication_id(PLAN), plan_deduplication_id(dict(PLAN)))
+
+    def test_any_field_changes_the_id(self):
+        for field in PLAN:
+            other = dict(PLAN, **{field: "other"})
+            self.assertNotEqual(
+                plan_deduplication_id(PLAN), plan_deduplication_id(other)
+            )
+
+    def test_batch_entries_carry_the_id(self):
+        sqs = MagicMock()
+        with patch("app.services.plan_publisher.get_sqs_client", return_value=sqs):
+            send_message_batch([PLAN])
+
+        entry = sqs.send_message_batch.call_args.kwargs["Entries"][0]
+        self.assertEqual(entry["MessageDeduplicationId"], plan_deduplication_id(PLAN))
+        self.assertEqual(entry["MessageGroupId"], "planner")
+
+
+if __name__ == "__main__":
+    unittest.main()
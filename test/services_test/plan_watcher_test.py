@@ -0,0 +1,181 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app.services.plan_watcher import (
+    PlanWatcher,
+    decode_plan_request_id,
+    encode_plan_request_id,
+    find_plan,
+)
+from app.services.upstream_client import PLANNER, UpstreamClient
+from app.utils.api_exception import APIException
+
+MESSAGE = {"user_id": 7, "plan_name": "Vacaciones", "destination": "Bariloche"}
+
+
+class TestFindPlan(unittest.TestCase):
+
+    def test_matches_name_and_destination(self):
+        plans = [
+            {"id": "1", "plan_name": "Vacaciones", "destination": "Mendoza"},
+            {"id": "2", "plan_name": "Vacaciones", "destination": "Bariloche"},
+        ]
+
+        self.assertEqual(find_plan(plans, MESSAGE, set())["id"], "2")
+
+    def test_skips_known_plans(self):
+        plans = [{"id": "1", "plan_name": "Vacaciones"}]
+
+        self.assertIsNone(find_plan(plans, MESSAGE, {"1"}))
+
+    def test_unexpected_payload(self):
+        self.assertIsNone(find_plan({"detail": "error"}, MESSAGE, set()))
+
+
+QUEUED = {**MESSAGE, "init_date": "2024-07-01", "end_date": "2024-07-10"}
+
+
+class TestPlanRequestId(unittest.TestCase):
+
+    def test_round_trip(self):
+        plan_request_id = encode_plan_request_id(QUEUED)
+
+        self.assertEqual(decode_plan_request_id(plan_request_id), QUEUED)
+        self.assertEqual(encode_plan_request_id(dict(QUEUED)), plan_request_id)
+
+    def test_tampered_id_is_rejected(self):
+        payload, _, signature = encode_plan_request_id(QUEUED).partition(".")
+        forged = encode_plan_request_id({**QUEUED, "user_id": 8}).partition(".")[0]
+
+        self.assertIsNone(decode_plan_request_id(f"{forged}.{signature}"))
+        self.assertIsNone(decode_plan_request_id(payload))
+        self.assertIsNone(decode_plan_request_id("not-an-id"))
+
+
+class TestPlanWatcher(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.plans = [{"id": "old", "plan_name": "Vacaciones"}]
+        self.polls = 0
+
+        def handler(request: httpx.Request):
+            self.polls += 1
+            return httpx.Response(200, json=self.plans)
+
+        self.upstream = UpstreamClient({PLANNER: "http://planner"})
+        self.upstream.clients[PLANNER] = httpx.AsyncClient(
+            base_url="http://planner", transport=httpx.MockTransport(handler)
+        )
+        patcher = patch("app.services.plan_watcher.upstream_client", self.upstream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.watcher = PlanWatcher(interval=0.01, timeout=1)
+
+    async def asyncTearDown(self):
+        await self.watcher.stop()
+        await self.upstream.close()
+
+    def watch(self):
+        self.watcher.watch("request", MESSAGE)
+        return self.watcher.get("request", 7)
+
+    async def collect(self, watch, keepalive=1):
+        return [event async for event in self.watcher.events(watch, keepalive)]
+
+    async def test_notifies_when_new_plan_appears(self):
+        watch = self.watch()
+        events = asyncio.ensure_future(self.collect(watch))
+        await asyncio.sleep(0.03)
+
+        self.plans.append({"id": "new", "plan_name": "Vacaciones"})
+        events = await events
+
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].startswith(b"event: plan_ready\n"))
+        self.assertIn(b'"id": "new"', events[0])
+        self.assertEqual(self.watcher.stats()["watching"], 0)
+
+    async def test_plans_present_at_first_poll_are_ignored(self):
+        self.watcher.timeout = 0.05
+        watch = self.watch()
+
+        events = await self.collect(watch)
+
+        self.assertEqual(events, [b"event: timeout\ndata: \n\n"])
+        self.assertGreater(self.polls, 1)
+
+    async def test_no_polling_without_subscribers(self):
+        self.watcher.timeout = 0.05
+        watch = self.watch()
+
+        result = await asyncio.wait_for(asyncio.shield(watch.result), 1)
+
+        self.assertIsNone(result)
+        self.assertEqual(self.polls, 0)
+        self.assertEqual(self.watcher.stats()["timeouts"], 1)
+
+    async def test_polling_stops_when_last_subscriber_leaves(self):
+        watch = self.watch()
+        events = self.watcher.events(watch, keepalive=0.01)
+        await events.__anext__()
+        self.assertEqual(self.watcher.stats()["polling"], 1)
+
+        await events.aclose()
+        await asyncio.sleep(0)
+        polls = self.polls
+        await asyncio.sleep(0.03)
+
+        self.assertEqual(self.watcher.stats()["polling"], 0)
+        self.assertEqual(self.polls, polls)
+        self.assertIn("request", self.watcher.watches)
+
+    async def test_one_watch_per_plan_request(self):
+        self.watcher.watch("request", MESSAGE)
+        self.watcher.watch("request", MESSAGE)
+
+        self.assertEqual(len(self.watcher.watches), 1)
+
+    async def test_other_users_cannot_subscribe(self):
+        self.watcher.watch("request", MESSAGE)
+
+        with self.assertRaises(APIException):
+            self.watcher.get("request", 8)
+        with self.assertRaises(APIException):
+            self.watcher.get("unknown", 7)
+
+    async def test_watch_is_rebuilt_from_the_id(self):
+        # e.g. queued on another replica
+        plan_request_id = encode_plan_request_id(QUEUED)
+
+        watch = self.watcher.get(plan_request_id, 7)
+
+        self.assertEqual(watch.message, QUEUED)
+        self.assertIs(self.watcher.get(plan_request_id, 7), watch)
+        with self.assertRaises(APIException):
+            PlanWatcher().get(plan_request_id, 8)
+
+    async def test_finished_watch_is_kept_for_late_subscribers(self):
+        watch = self.watch()
+        events = asyncio.ensure_future(self.collect(watch))
+        await asyncio.sleep(0.03)
+        self.plans.append({"id": "new", "plan_name": "Vacaciones"})
+        await events
+
+        self.assertIs(self.watcher.get("request", 7), watch)
+
+    async def test_timeout_event(self):
+        self.watcher.timeout = 0.03
+        watch = self.watch()
+
+        events = await self.collect(watch, keepalive=0.01)
+
+        self.assertIn(b": keepalive\n\n", events)
+        self.assertEqual(events[-1], b"event: timeout\ndata: \n\n")
+        self.assertEqual(self.watcher.stats()["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from app.routers.planner.planner_queue import queue_plan, recent_plans
+from app.schemas.planner_schemas.planner import PlanMetaData
+
+PLAN = PlanMetaData(
+    plan_name="Vacaciones",
+    destination="Bariloche",
+    init_date=date(2024, 7, 1),
+    end_date=date(2024, 7, 10),
+)
+
+
+class FakeOutbox:
+
+    def __init__(self):
+        self.messages = []
+
+    async def add(self, message):
+        await asyncio.sleep(0.01)
+        self.messages.append(message)
+
+
+class TestQueuePlan(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        recent_plans.clear()
+        self.outbox = FakeOutbox()
+        self.watched = []
+        for name, value in (
+            ("plan_outbox", self.outbox),
+            ("plan_watcher.watch", lambda *args: self.watched.append(args)),
+        ):
+            patcher = patch(f"app.routers.planner.planner_queue.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_concurrent_duplicates_are_coalesced(self):
+        await asyncio.gather(*[queue_plan(7, PLAN) for _ in range(3)])
+
+        self.assertEqual(len(self.outbox.messages), 1)
+
+    async def test_repeat_within_window_is_dropped(self):
+        await queue_plan(7, PLAN)
+        await queue_plan(7, PLAN)
+
+        self.assertEqual(len(self.outbox.messages), 1)
+
+    async def test_duplicates_share_the_plan_request_id(self):
+        first = await queue_plan(7, PLAN)
+        second = await queue_plan(7, PLAN)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.watched, [(first, self.outbox.messages[0])])
+
+    async def test_other_users_are_queued(self):
+        await queue_plan(7, PLAN)
+        await queue_plan(8, PLAN)
+
+        self.assertEqual([m["user_id"] for m in self.outbox.messages], [7, 8])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+
+import httpx
+
+from app.services.retry_policy import RetryBudget, RetryPolicy
+from app.services.upstream_client import ATTRACTIONS, UpstreamClient
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def no_sleep(delay):
+    pass
+
+
+class TestRetryBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.budget = RetryBudget(
+            ratio=0.5, min_per_second=1, max_balance=2, clock=self.clock
+        )
+
+    def test_reserve_allows_one_retry_per_second(self):
+        self.assertTrue(self.budget.withdraw())
+        self.assertFalse(self.budget.withdraw())
+
+        self.clock.now = 1
+        self.assertTrue(self.budget.withdraw())
+
+    def test_deposits_fund_retries(self):
+        self.budget.withdraw()
+        self.budget.deposit()
+        self.budget.deposit()
+
+        self.assertTrue(self.budget.withdraw())
+        self.assertFalse(self.budget.withdraw())
+
+    def test_balance_is_capped(self):
+        for _ in range(100):
+            self.budget.deposit()
+
+        self.assertEqual(self.budget.balance, 2)
+
+
+class TestUpstreamRetries(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = []
+        self.responses = []
+
+        def handler(request: httpx.Request):
+            self.calls.append(request.method)
+            response = self.responses.pop(0) if self.responses else 200
+            if response == "reset":
+                raise httpx.ReadError("connection reset", request=request)
+            return httpx.Response(response, json={})
+
+        self.upstream = UpstreamClient({ATTRACTIONS: "http://attractions"})
+        self.upstream.retry_policy = RetryPolicy(
+            RetryBudget(min_per_second=10), max_attempts=3, sleep=no_sleep
+        )
+        self.upstream.clients[ATTRACTIONS] = httpx.AsyncClient(
+            base_url="http://attractions", transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    async def test_get_is_retried_on_reset(self):
+        self.responses = ["reset", 503]
+
+        response = await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(
+            self.upstream.retry_policy.stats()["routes"]["background"]["retries"], 2
+        )
+
+    async def test_gives_up_after_max_attempts(self):
+        self.responses = [503, 503, 503, 503]
+
+        response = await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.calls), 3)
+
+    async def test_client_errors_are_not_retried(self):
+        self.responses = [500, 404]
+
+        response = await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_post_is_not_retried(self):
+        self.responses = [503]
+
+        response = await self.upstream.post(ATTRACTIONS, "/attractions/save")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_delete_opts_in(self):
+        self.responses = [503]
+
+        response = await self.upstream.delete(
+            ATTRACTIONS, "/attractions/unsave", json={}, idempotent=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, ["DELETE", "DELETE"])
+
+    async def test_empty_budget_stops_retries(self):
+        self.upstream.retry_policy.budget = RetryBudget(ratio=0, min_per_second=0)
+        self.responses = [503]
+
+        response = await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            self.upstream.retry_policy.stats()["routes"]["background"][
+                "budget_exhausted"
+            ],
+            1,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
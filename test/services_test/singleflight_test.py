@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+import app
+from app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.singleflight = SingleFlight()
+        self.release = asyncio.Event()
+        self.executions = 0
+
+    async def slow_call(self, result):
+        self.executions += 1
+        await self.release.wait()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def test_concurrent_calls_share_one_execution(self):
+        tasks = [
+            asyncio.create_task(self.singleflight.do("a", lambda: self.slow_call(1)))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.executions, 1)
+        self.assertEqual(self.singleflight.coalesced, 4)
+        self.assertEqual(self.singleflight.calls, {})
+
+    async def test_errors_are_propagated_per_key(self):
+        failing = [
+            asyncio.create_task(
+                self.singleflight.do("a", lambda: self.slow_call(ValueError("a")))
+            )
+            for _ in range(2)
+        ]
+        succeeding = asyncio.create_task(
+            self.singleflight.do("b", lambda: self.slow_call(2))
+        )
+        await asyncio.sleep(0)
+        self.release.set()
+
+        for task in failing:
+            with self.assertRaises(ValueError):
+                await task
+        self.assertEqual(await succeeding, 2)
+        self.assertEqual(self.executions, 2)
+
+    async def test_sequential_calls_are_not_shared(self):
+        self.release.set()
+
+        await self.singleflight.do("a", lambda: self.slow_call(1))
+        await self.singleflight.do("a", lambda: self.slow_call(1))
+
+        self.assertEqual(self.executions, 2)
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        first = asyncio.create_task(
+            self.singleflight.do("a", lambda: self.slow_call(1))
+        )
+        second = asyncio.create_task(
+            self.singleflight.do("a", lambda: self.slow_call(1))
+        )
+        await asyncio.sleep(0)
+
+        first.cancel()
+        self.release.set()
+
+        self.assertEqual(await second, 1)
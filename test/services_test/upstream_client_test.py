@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+
+import httpx
+
+import app
+from app.services.upstream_client import (
+    ATTRACTIONS,
+    AUTHENTICATION,
+    UpstreamClient,
+)
+
+
+class TestUpstreamClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = []
+
+        async def handler(request: httpx.Request):
+            self.calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"path": request.url.path})
+
+        self.upstream = UpstreamClient(
+            {
+                ATTRACTIONS: "http://attractions",
+                AUTHENTICATION: "http://authentication",
+            }
+        )
+        for name, base_url in self.upstream.base_urls.items():
+            self.upstream.clients[name] = httpx.AsyncClient(
+                base_url=base_url, transport=httpx.MockTransport(handler)
+            )
+
+    async def asyncTearDown(self):
+        await self.upstream.close()
+
+    async def test_request_uses_upstream_base_url(self):
+        response = await self.upstream.get(ATTRACTIONS, "/metadata")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"path": "/metadata"})
+        self.assertEqual(str(self.calls[0].url), "http://attractions/metadata")
+
+    async def test_none_params_are_not_sent(self):
+        await self.upstream.get(
+            ATTRACTIONS, "/weather", params={"city": "Salta", "province": None}
+        )
+
+        self.assertEqual(str(self.calls[0].url.query, "ascii"), "city=Salta")
+
+    async def test_redirects_are_followed(self):
+        client = self.upstream._build_client(ATTRACTIONS)
+
+        self.assertTrue(client.follow_redirects)
+        await client.aclose()
+
+    async def test_delete_sends_json_body(self):
+        await self.upstream.delete(
+            AUTHENTICATION, "/users", json={"user_id": 1, "attraction_id": "a"}
+        )
+
+        self.assertEqual(self.calls[0].method, "DELETE")
+        self.assertEqual(self.calls[0].read(), b'{"user_id": 1, "attraction_id": "a"}')
+
+    async def test_one_pool_per_upstream(self):
+        first = self.upstream.client(ATTRACTIONS)
+        second = self.upstream.client(ATTRACTIONS)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, self.upstream.client(AUTHENTICATION))
+
+    async def test_unknown_upstream(self):
+        with self.assertRaises(KeyError):
+            self.upstream.client("unknown")
+
+    async def test_start_and_close(self):
+        upstream = UpstreamClient({ATTRACTIONS: "http://attractions"})
+
+        await upstream.start()
+        self.assertIn(ATTRACTIONS, upstream.clients)
+
+        await upstream.close()
+        self.assertEqual(upstream.clients, {})
+
+    async def test_concurrent_identical_gets_are_coalesced(self):
+        responses = await asyncio.gather(
+            *[
+                self.upstream.get(ATTRACTIONS, "/weather", params={"city": "Salta"})
+                for _ in range(5)
+            ]
+        )
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(all(r.json() == {"path": "/weather"} for r in responses))
+
+    async def test_different_gets_are_not_coalesced(self):
+        await asyncio.gather(
+            self.upstream.get(ATTRACTIONS, "/weather", params={"city": "Salta"}),
+            self.upstream.get(ATTRACTIONS, "/weather", params={"city": "Jujuy"}),
+            self.upstream.get(
+                ATTRACTIONS,
+                "/weather",
+                params={"city": "Salta"},
+                headers={"Authorization": "Bearer other"},
+            ),
+        )
+
+        self.assertEqual(len(self.calls), 3)
+
+    async def test_writes_are_not_coalesced(self):
+        await asyncio.gather(
+            *[self.upstream.post(ATTRACTIONS, "/attractions/like") for _ in range(3)]
+        )
+
+        self.assertEqual(len(self.calls), 3)
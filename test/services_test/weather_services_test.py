@@ -7,7 +7,12 @@ from app.schemas.external_services_schemas.weather import (
     FiveDayWeather,
     Weather,
 )
-from app.services.external_services.weather_services import parse_weather_days
+from app.services.external_services.weather_services import (
+    WEATHER_FORECAST_INTERVAL,
+    parse_weather_days,
+    seconds_until_next_forecast,
+    weather_cache_key,
+)
 
 
 class TestParseWeatherDays(unittest.TestCase):
@@ -118,3 +123,27 @@ class TestParseWeatherDays(unittest.TestCase):
                 day_weather.weather.visibility,
                 weather_data["five_day_weather"][idx]["weather"]["visibility"],
             )
+
+
+class TestWeatherCache(unittest.TestCase):
+
+    def test_weather_cache_key_is_normalized(self):
+        self.assertEqual(
+            weather_cache_key("  Buenos   Aires ", "CABA", None),
+            weather_cache_key("buenos aires", "caba", ""),
+        )
+        self.assertNotEqual(
+            weather_cache_key("Cordoba", None, "Argentina"),
+            weather_cache_key("Cordoba", None, "Spain"),
+        )
+
+    def test_seconds_until_next_forecast(self):
+        boundary = WEATHER_FORECAST_INTERVAL * 1000
+
+        self.assertEqual(
+            seconds_until_next_forecast(boundary), WEATHER_FORECAST_INTERVAL
+        )
+        self.assertEqual(
+            seconds_until_next_forecast(boundary + 60), WEATHER_FORECAST_INTERVAL - 60
+        )
+        self.assertEqual(seconds_until_next_forecast(boundary - 1), 1)
@@ -0,0 +1,21 @@
+import unittest
+
+import app
+from app.utils.startup_benchmark import run_probe, summarize
+
+
+class TestStartupBenchmark(unittest.TestCase):
+
+    def test_import_does_not_load_heavy_modules(self):
+        sample = run_probe()
+
+        self.assertEqual(sample["heavy_modules"], [])
+        self.assertGreater(sample["import_time"], 0)
+        self.assertGreater(sample["import_rss_kb"], sample["baseline_rss_kb"])
+        self.assertIsNone(sample["startup_time"])
+
+    def test_summarize(self):
+        self.assertEqual(
+            summarize([3.0, None, 1.0, 2.0]), {"median": 2.0, "min": 1.0, "max": 3.0}
+        )
+        self.assertIsNone(summarize([None]))
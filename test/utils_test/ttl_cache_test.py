@@ -0,0 +1,71 @@
+import unittest
+
+import app
+from app.utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_size=2, clock=self.clock)
+
+    def test_get_and_set(self):
+        self.cache.set("a", 1, ttl=10)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_entry_expires(self):
+        self.cache.set("a", 1, ttl=10)
+        self.clock.now = 10
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_non_positive_ttl_is_not_stored(self):
+        self.cache.set("a", 1, ttl=0)
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.set("a", 1, ttl=10)
+        self.cache.set("b", 2, ttl=10)
+        self.cache.get("a")
+        self.cache.set("c", 3, ttl=10)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), 3)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_delete_where(self):
+        self.cache.set("a", 1, ttl=10)
+        self.cache.set("b", 2, ttl=10)
+
+        deleted = self.cache.delete_where(lambda key, value: value > 1)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_stats(self):
+        self.cache.set("a", 1, ttl=10)
+        self.cache.get("a")
+
+        stats = self.cache.stats()
+
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["max_size"], 2)
+        self.assertEqual(stats["hits"], 1)